@@ -0,0 +1,98 @@
+"""Compare serial and process-pool CSV import parsing.
+
+Usage: python benchmarks/import_parallel.py [rows] [workers]
+
+Generates a synthetic bank export with realistic, unique descriptions, then
+times ``import_csv`` serially and with ``workers`` processes and checks that
+both produce the same rows. The description and merchant caches are cleared
+before each run so neither mode is measured against a warm cache.
+"""
+
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import categories  # noqa: E402
+import csv_importer  # noqa: E402
+from csv_importer import import_csv  # noqa: E402
+
+# Each row fills one template with a fresh store number, reference and place,
+# so descriptions (and most merchants) never repeat
+TEMPLATES = [
+    'Branch Cash Withdrawal {date} {time} POS WALMART {store} {state}',
+    'POS DEBIT {date} STARBUCKS STORE {store} {city} {state}',
+    'ACH WITHDRAWAL NETFLIX.COM {phone} {state}',
+    'Card Purchase {date} SHELL OIL {store} {city} {state}',
+    'RECURRING PAYMENT AMAZON PRIME*{ref} AMZN.COM/BILL {state}',
+    'DEBIT CARD PURCHASE XXXXX{ref} {word} {word2} {store} {city} {state}',
+]
+WORDS = ['LOCAL', 'HARDWARE', 'BISTRO', 'MARKET', 'GARDEN', 'SUPPLY', 'CORNER', 'BAKERY',
+         'TAVERN', 'OUTLET', 'STUDIO', 'PANTRY', 'CYCLES', 'BOOKS', 'DELI', 'FLORIST']
+CITIES = ['SEATTLE', 'HOUSTON', 'PORTLAND', 'ATLANTA', 'DENVER', 'BOSTON', 'AUSTIN', 'TAMPA']
+
+
+def description(rng, i):
+    return rng.choice(TEMPLATES).format(
+        date=f'{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}',
+        time=f'{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}',
+        store=f'{i:07d}',
+        ref=f'{i:06X}',
+        phone=f'{rng.randint(200, 999)}-{rng.randint(200, 999)}-{i % 10000:04d}',
+        state=rng.choice(csv_importer.US_STATES),
+        city=rng.choice(CITIES),
+        word=rng.choice(WORDS),
+        word2=rng.choice(WORDS),
+    )
+
+
+def write_sample(path, rows):
+    rng = random.Random(42)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Post Date', 'Description', 'Amount'])
+        for i in range(rows):
+            writer.writerow([
+                f'07/{i % 28 + 1:02d}/2025',
+                description(rng, i),
+                f'-{rng.uniform(1, 200):.2f}',
+            ])
+
+
+def clear_caches():
+    """Start each mode cold; forked workers inherit the parent's caches."""
+    csv_importer._parse_description_cached.cache_clear()
+    categories._categorize_cached.cache_clear()
+
+
+def timed(path, workers):
+    clear_caches()
+    started = time.perf_counter()
+    result = import_csv(path, workers=workers)
+    return time.perf_counter() - started, result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    cpus = os.cpu_count() or 1
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else max(cpus, 2)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'sample.csv')
+        write_sample(path, rows)
+        serial_time, serial = timed(path, None)
+        parallel_time, parallel = timed(path, workers)
+    assert parallel == serial, 'parallel import changed the result'
+    print(f'rows:     {rows} (unique descriptions, cold caches)')
+    print(f'serial:   {serial_time:.2f}s ({rows / serial_time:,.0f} rows/s)')
+    print(f'parallel: {parallel_time:.2f}s ({rows / parallel_time:,.0f} rows/s, {workers} workers on {cpus} CPUs)')
+    print(f'speedup:  {serial_time / parallel_time:.2f}x')
+    if workers > cpus:
+        print(f'note:     {workers} workers exceed the {cpus} available CPUs; expect no speedup')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""Micro-benchmark for ``parse_description``.
+
+Usage: python benchmarks/parse_description.py [rows]
+
+Runs the current implementation and the legacy regex chain kept in
+``tests/test_parse_description.py`` over the same generated corpus and
+reports rows/sec for each.
+"""
+
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tests'))
+
+from csv_importer import parse_description  # noqa: E402
+from test_parse_description import corpus, legacy_parse_description  # noqa: E402
+
+
+def rate(func, rows):
+    started = time.perf_counter()
+    for raw in rows:
+        func(raw)
+    return len(rows) / (time.perf_counter() - started)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    rows = list(corpus(n // 2))
+    legacy = rate(legacy_parse_description, rows)
+    current = rate(parse_description, rows)
+    print(f'rows:    {len(rows)}')
+    print(f'legacy:  {legacy:,.0f} rows/s')
+    print(f'current: {current:,.0f} rows/s')
+    print(f'speedup: {current / legacy:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
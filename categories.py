@@ -1,6 +1,9 @@
 import json
 import os
-from typing import Dict, Optional
+import tempfile
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
 
 # Default keyword-to-category mapping. This can be extended by users at runtime.
 DEFAULT_CATEGORY_KEYWORDS: Dict[str, str] = {
@@ -112,30 +115,207 @@ DEFAULT_CATEGORY_KEYWORDS: Dict[str, str] = {
 # Location of the persistent keyword mapping file. Users can edit this file or
 # add new keywords at runtime via ``add_keyword_category``.
 _KEYWORDS_PATH = os.path.join(os.path.dirname(__file__), 'category_keywords.json')
+# Runtime additions are appended here (one JSON object per line) and folded
+# back into ``category_keywords.json`` once the journal grows past
+# ``JOURNAL_COMPACT_THRESHOLD`` entries.
+_JOURNAL_PATH = os.path.join(os.path.dirname(__file__), 'category_keywords.journal')
+JOURNAL_COMPACT_THRESHOLD = 500
+
+_keywords_lock = threading.Lock()
+_journal_entries = 0
+
+
+def _replay_journal(keywords: Dict[str, str]) -> int:
+    """Apply journaled mappings on top of ``keywords``; returns entries read."""
+    count = 0
+    try:
+        with open(_JOURNAL_PATH, 'r', encoding='utf-8') as fh:
+            for line in fh:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-append
+                    continue
+                keywords[entry['keyword']] = entry['category']
+                count += 1
+    except FileNotFoundError:
+        pass
+    return count
+
 
 try:
     with open(_KEYWORDS_PATH, 'r', encoding='utf-8') as fh:
         CATEGORY_KEYWORDS: Dict[str, str] = json.load(fh)
 except FileNotFoundError:
     CATEGORY_KEYWORDS = DEFAULT_CATEGORY_KEYWORDS.copy()
+_journal_entries = _replay_journal(CATEGORY_KEYWORDS)
 
 
 def _save_keywords() -> None:
-    """Persist ``CATEGORY_KEYWORDS`` to disk."""
-    with open(_KEYWORDS_PATH, 'w', encoding='utf-8') as fh:
-        json.dump(CATEGORY_KEYWORDS, fh, indent=2, sort_keys=True)
+    """Atomically rewrite ``category_keywords.json`` and empty the journal."""
+    global _journal_entries
+    directory = os.path.dirname(_KEYWORDS_PATH) or '.'
+    fd, tmp_path = tempfile.mkstemp(prefix='.category_keywords.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as fh:
+            json.dump(CATEGORY_KEYWORDS, fh, indent=2, sort_keys=True)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, _KEYWORDS_PATH)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    # Replaying a journal that survived a crash here is harmless: every entry
+    # is already in the compacted file.
+    if os.path.exists(_JOURNAL_PATH):
+        os.remove(_JOURNAL_PATH)
+    _journal_entries = 0
+
+
+def _append_journal(mappings: Dict[str, str]) -> None:
+    """Append mappings to the journal in one write, compacting when it is long."""
+    global _journal_entries
+    lines = ''.join(
+        json.dumps({'keyword': keyword, 'category': category}) + '\n'
+        for keyword, category in mappings.items()
+    )
+    with open(_JOURNAL_PATH, 'a', encoding='utf-8') as fh:
+        fh.write(lines)
+        fh.flush()
+        os.fsync(fh.fileno())
+    _journal_entries += len(mappings)
+    if _journal_entries >= JOURNAL_COMPACT_THRESHOLD:
+        _save_keywords()
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton over an ordered list of keywords.
+
+    ``first_match`` scans a string once and returns the index of the
+    earliest-listed keyword occurring anywhere in it, which is the keyword a
+    linear ``for keyword in ...: if keyword in text`` loop would pick.
+    """
+
+    _NO_MATCH = float('inf')
+
+    def __init__(self, keywords: Iterable[str]) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Lowest keyword index ending at each state, including via fail links
+        self._best: List[float] = [self._NO_MATCH]
+        for index, keyword in enumerate(keywords):
+            state = 0
+            for ch in keyword:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._best.append(self._NO_MATCH)
+                state = nxt
+            self._best[state] = min(self._best[state], index)
+
+        # Breadth-first pass to fill in failure links
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for ch, nxt in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._best[nxt] = min(self._best[nxt], self._best[self._fail[nxt]])
+                queue.append(nxt)
+
+    def first_match(self, text: str) -> Optional[int]:
+        """Index of the highest-priority keyword found in ``text``, if any."""
+        goto, fail, best_at = self._goto, self._fail, self._best
+        best = best_at[0]
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if best_at[state] < best:
+                best = best_at[state]
+                if best == 0:
+                    break
+        return None if best == self._NO_MATCH else int(best)
+
+
+# Compiled form of ``CATEGORY_KEYWORDS`` as an (automaton, categories by
+# keyword index) pair; rebuilt lazily when marked stale. The pair is only
+# ever replaced whole so readers never see one half updated.
+_compiled: Optional[Tuple[KeywordAutomaton, List[str]]] = None
+
+# Bumped on every keyword change; part of the merchant cache key so stale
+# categorizations are never served.
+_keywords_version = 0
+MERCHANT_CACHE_SIZE = 4096
+
+
+def _keyword_automaton() -> Tuple[KeywordAutomaton, List[str]]:
+    """Return the automaton and categories for the current keywords, building them if stale."""
+    global _compiled
+    compiled = _compiled
+    if compiled is None:
+        compiled = _compiled = (KeywordAutomaton(CATEGORY_KEYWORDS), list(CATEGORY_KEYWORDS.values()))
+    return compiled
+
+
+def invalidate_keywords() -> None:
+    """Mark the compiled keyword automaton stale after ``CATEGORY_KEYWORDS`` changes."""
+    global _compiled, _keywords_version
+    _compiled = None
+    _keywords_version += 1
+
+
+@lru_cache(maxsize=MERCHANT_CACHE_SIZE)
+def _categorize_cached(upper: str, version: int) -> Optional[str]:
+    """Keyword lookup for an upper-cased merchant, memoized per keyword version."""
+    automaton, categories = _keyword_automaton()
+    index = automaton.first_match(upper)
+    return None if index is None else categories[index]
+
+
+def categorize_cache_info():
+    """``functools`` cache statistics for merchant categorization."""
+    return _categorize_cached.cache_info()
 
 
 def categorize_merchant(merchant: str) -> Optional[str]:
-    """Return the category for a merchant based on keyword matching."""
-    upper = merchant.upper()
-    for keyword, category in CATEGORY_KEYWORDS.items():
-        if keyword in upper:
-            return category
-    return None
+    """Return the category for a merchant based on keyword matching.
+
+    The first keyword (in ``CATEGORY_KEYWORDS`` order) contained in the
+    merchant name wins.
+    """
+    return _categorize_cached(merchant.upper(), _keywords_version)
+
+
+def add_keyword_categories(mappings: Dict[str, str]) -> int:
+    """Add many keyword mappings with a single journal append.
+
+    Returns the number of mappings applied.
+    """
+    global _compiled, _keywords_version
+    mappings = {keyword.upper(): category for keyword, category in mappings.items()}
+    if not mappings:
+        return 0
+    with _keywords_lock:
+        added = any(keyword not in CATEGORY_KEYWORDS for keyword in mappings)
+        CATEGORY_KEYWORDS.update(mappings)
+        if added:
+            invalidate_keywords()
+        else:
+            if _compiled is not None:
+                # Same keywords, same priority: only the categories change.
+                # Swap in a new list before the version moves on.
+                _compiled = (_compiled[0], list(CATEGORY_KEYWORDS.values()))
+            _keywords_version += 1
+        _append_journal(mappings)
+    return len(mappings)
 
 
 def add_keyword_category(keyword: str, category: str) -> None:
     """Add a new keyword mapping and persist it."""
-    CATEGORY_KEYWORDS[keyword.upper()] = category
-    _save_keywords()
+    add_keyword_categories({keyword: category})
@@ -7,76 +7,131 @@ transactions using simple keyword matching.
 
 from __future__ import annotations
 
+import codecs
 import csv
+import hashlib
+import io
+import itertools
+import os
 import re
-from typing import Dict, List, Optional, Set, Tuple
+from collections import deque
+from datetime import date, datetime
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, BinaryIO, Deque, Dict, Iterable, Iterator, List, Mapping, Optional, Set, TextIO, Tuple, Union
 
-from categories import categorize_merchant
+from categories import categorize_cache_info, categorize_merchant
+from merchant_index import TrigramIndex, normalize_merchant
+
+
+def _cp1252_fallback(error: UnicodeError) -> Tuple[str, int]:
+    """Decode bytes that are not valid UTF-8 as Windows-1252 (a superset of Latin-1 text)."""
+    if not isinstance(error, UnicodeDecodeError):
+        raise error
+    return error.object[error.start:error.end].decode('cp1252', errors='replace'), error.end
+
+
+# Bank exports are mostly UTF-8 (often with a BOM) but older ones are
+# Windows-1252/Latin-1; stray bytes are decoded one by one instead of failing.
+codecs.register_error('cp1252-fallback', _cp1252_fallback)
+CSV_ENCODING = 'utf-8-sig'
+CSV_ENCODING_ERRORS = 'cp1252-fallback'
+
+
+def decode_csv_bytes(data: bytes) -> str:
+    """Decode a whole CSV upload, tolerating non-UTF-8 exports."""
+    return data.decode(CSV_ENCODING, errors=CSV_ENCODING_ERRORS)
+
+
+class _RawReader(io.RawIOBase):
+    """Readable raw stream over any object with ``read``.
+
+    ``TextIOWrapper`` needs ``readable()``, which e.g. ``SpooledTemporaryFile``
+    (Werkzeug's upload spool) lacks before Python 3.11.
+    """
+
+    def __init__(self, binary: BinaryIO) -> None:
+        self._binary = binary
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        data = self._binary.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def open_csv_stream(binary: BinaryIO) -> TextIO:
+    """Wrap a binary upload stream for reading as CSV text, tolerating non-UTF-8 exports."""
+    return io.TextIOWrapper(io.BufferedReader(_RawReader(binary)), encoding=CSV_ENCODING,
+                            errors=CSV_ENCODING_ERRORS, newline='')
 
 
 # --- text parsing helpers (adapted from banking-class repository) ---
-STATES_RE = re.compile(
-    r'(AL|AK|AZ|AR|CA|CO|CT|DE|FL|GA|HI|ID|IL|IN|IA|KS|KY|LA|ME|MD|MA|MI|MN|MS|MO|MT|NE|NV|NH|'
-    r'NJ|NM|NY|NC|ND|OH|OK|OR|PA|RI|SC|SD|TN|TX|UT|VT|VA|WA|WV|WI|WY)$'
-)
+US_STATES = (
+    'AL AK AZ AR CA CO CT DE FL GA HI ID IL IN IA KS KY LA ME MD MA MI MN MS MO MT NE NV NH '
+    'NJ NM NY NC ND OH OK OR PA RI SC SD TN TX UT VT VA WA WV WI WY'
+).split()
+STATES_RE = re.compile('(' + '|'.join(US_STATES) + ')$')
 
 THIRD_PARTIES_RE = re.compile(r'^(...?\*|LEVELUP\*|PAYPAL \*)')
 
+_TIME_RE = re.compile(r'[0-9]{2}:[0-9]{2}:[0-9]{2}')
+_DATE_RE = re.compile(r'[0-1][0-9]/[0-3][0-9]')
+_BRANCH_RE = re.compile('Branch Cash Withdrawal', re.IGNORECASE)
+_PHONE_RE = re.compile(r'[0-9]{3}-[0-9]{3}-[0-9]{4}')
+_STATES = frozenset(US_STATES)
 
-def parse_description(raw: str) -> Dict[str, Optional[str]]:
-    """Parse a raw transaction description into components."""
-    desc = raw
-    time = None
-    date = None
-    phone = None
-    country = None
-    state = None
+# Merchant clean-up, applied in order to the upper-cased description. Each
+# entry is (pattern, strip_after); the anchored patterns rely on whitespace
+# being stripped between steps.
+_MERCHANT_STEPS = (
+    (THIRD_PARTIES_RE, False),
+    (re.compile(r'\s\s+.+$'), True),
+    (re.compile(r'X+-?X+'), False),
+    (re.compile(r'( ID:.*| PAYMENT ID:.*| PMT ID:.*)'), True),
+    (re.compile(r'[#]?[ ]?([0-9]){1,999}$'), True),
+    (re.compile(r'([ ]?-[ ]?|[_])'), True),
+    (re.compile(r'[.]com.*$'), True),
+    (re.compile(r' .$'), True),
+)
 
-    m = re.search(r'([0-9]{2}:[0-9]{2}:[0-9]{2})', desc)
-    if m:
-        time = m.group(1)
-        desc = re.sub(r'([0-9]{2}:[0-9]{2}:[0-9]{2})', '', desc, count=1)
 
-    m = re.search(r'([0-1][0-9]/[0-3][0-9])', desc)
-    if m:
-        date = m.group(1)
-        desc = re.sub(r'([0-1][0-9]/[0-3][0-9])', '', desc, count=1)
+def _cut(pattern: re.Pattern, text: str) -> Tuple[Optional[str], str]:
+    """Remove the first match of ``pattern``; returns (matched text, rest)."""
+    m = pattern.search(text)
+    if not m:
+        return None, text
+    return m.group(), text[:m.start()] + text[m.end():]
 
-    desc = re.sub('Branch Cash Withdrawal', '', desc, flags=re.IGNORECASE)
 
-    m = re.search(r'([0-9]{3}-[0-9]{3}-[0-9]{4})', desc)
-    if m:
-        phone = m.group(1)
-        desc = re.sub(r'([0-9]{3}-[0-9]{3}-[0-9]{4})', '', desc, count=1)
+def parse_description(raw: str) -> Dict[str, Optional[str]]:
+    """Parse a raw transaction description into components."""
+    time, desc = _cut(_TIME_RE, raw)
+    date, desc = _cut(_DATE_RE, desc)
+    desc = _BRANCH_RE.sub('', desc)
+    phone, desc = _cut(_PHONE_RE, desc)
 
     desc = desc.strip()
-    desc = re.sub(r'^POS ', '', desc)
+    if desc.startswith('POS '):
+        desc = desc[4:]
 
-    m = re.search(r'(US)$', desc)
-    if m:
-        country = m.group(1)
-        desc = re.sub(r'(US)$', '', desc).strip()
+    country = None
+    if desc.endswith('US'):
+        country = 'US'
+        desc = desc[:-2].strip()
 
-    m = STATES_RE.search(desc)
-    if m:
-        state = m.group(1)
-        desc = STATES_RE.sub('', desc).strip()
+    state = None
+    if desc[-2:] in _STATES:
+        state = desc[-2:]
+        desc = desc[:-2].strip()
 
     merchant = desc.upper()
-    merchant = THIRD_PARTIES_RE.sub('', merchant)
-    merchant = re.sub(r'\s\s+.+$', '', merchant)
-    merchant = merchant.strip()
-    merchant = re.sub(r'X+-?X+', '', merchant)
-    merchant = re.sub(r'( ID:.*| PAYMENT ID:.*| PMT ID:.*)', '', merchant)
-    merchant = merchant.strip()
-    merchant = re.sub(r'[#]?[ ]?([0-9]){1,999}$', '', merchant)
-    merchant = merchant.strip()
-    merchant = re.sub(r'([ ]?-[ ]?|[_])', '', merchant)
-    merchant = merchant.strip()
-    merchant = re.sub(r'[.]com.*$', '', merchant)
-    merchant = merchant.strip()
-    merchant = re.sub(r' .$', '', merchant)
-    merchant = merchant.strip()
+    for pattern, strip_after in _MERCHANT_STEPS:
+        merchant = pattern.sub('', merchant)
+        if strip_after:
+            merchant = merchant.strip()
     if merchant == '':
         merchant = ' '
 
@@ -91,22 +146,24 @@ def parse_description(raw: str) -> Dict[str, Optional[str]]:
     }
 
 
-def _skip_leading_empty(f, limit: int = 10) -> None:
-    """Advance file iterator to the first potential header line.
+def _skip_leading_empty(lines: Iterator[str], limit: int = 10) -> Tuple[List[str], int]:
+    """Consume lines up to the first potential header line.
 
     Many bank CSV exports start with a few blank or informational lines before
-    the actual header row.  This helper scans the first ``limit`` lines and
-    positions the file handle at the first line that appears to contain delimited
-    data (at least one comma/semicolon/tab).
+    the actual header row.  This helper scans the first ``limit`` lines of the
+    iterator and returns a peek buffer starting at the first line that appears
+    to contain delimited data (at least one comma/semicolon/tab), along with
+    the number of preamble lines skipped.  It only reads forward, so it works
+    on non-seekable streams.
     """
 
-    start = f.tell()
     delimiters = ",;\t"
+    seen: List[str] = []
     for _ in range(limit):
-        pos = f.tell()
-        line = f.readline()
+        line = next(lines, "")
         if line == "":
             break
+        seen.append(line)
         stripped = line.strip()
         if not stripped:
             continue
@@ -114,13 +171,19 @@ def _skip_leading_empty(f, limit: int = 10) -> None:
             continue
         if not any(d in line for d in delimiters):
             continue
-        f.seek(pos)
-        return
-    # If no suitable line found within limit, reset to start so caller can
-    # handle the lack of data gracefully.
-    f.seek(start)
+        return [line], len(seen) - 1
+    # If no suitable line found within limit, replay everything read so the
+    # caller can handle the lack of data gracefully.
+    return seen, 0
 
 
+# Lines scanned for the header row before giving up
+PREAMBLE_LIMIT = 10
+# Characters of the file handed to csv.Sniffer
+SNIFF_SAMPLE_SIZE = 2048
+# Rows per task when parsing in a process pool
+PARALLEL_CHUNK_SIZE = 2000
+
 DESC_FIELDS = {'description', 'desc', 'payee', 'memo', 'name', 'action'}
 AMOUNT_FIELDS = {'amount', 'amt', 'transaction amount', 'debit', 'credit'}
 DATE_FIELDS = {
@@ -135,122 +198,479 @@ DATE_FIELDS = {
 }
 
 
-def import_csv(path: str) -> Tuple[List[Dict[str, Optional[str]]], Set[str]]:
-    """Import CSV of transactions.
+def _parse_amount(amount_str: str) -> Optional[float]:
+    """Convert a bank amount string such as ``$(1,234.50)`` to a float."""
+    amount_str = amount_str.replace('$', '').replace(',', '')
+    amount_str = amount_str.replace('(', '-').replace(')', '')
+    try:
+        return float(amount_str)
+    except ValueError:
+        return None
 
-    Returns a tuple of (rows, unknown_merchants).
+
+# Statements repeat the same descriptions; remember the parsed form of the
+# most recent ones.
+DESCRIPTION_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=DESCRIPTION_CACHE_SIZE)
+def _parse_description_cached(raw: str) -> Tuple[str, Optional[str]]:
+    """Memoized ``(merchant, date)`` from ``parse_description``."""
+    parsed = parse_description(raw)
+    return parsed['merchant'] or '', parsed['date']
+
+
+def cache_counters() -> Dict[str, int]:
+    """Hit and miss counts of the description and merchant category caches."""
+    desc = _parse_description_cached.cache_info()
+    cat = categorize_cache_info()
+    return {
+        'description_hits': desc.hits,
+        'description_misses': desc.misses,
+        'category_hits': cat.hits,
+        'category_misses': cat.misses,
+    }
+
+
+def _counters_since(before: Dict[str, int]) -> Dict[str, int]:
+    """Cache hits and misses since an earlier ``cache_counters`` snapshot."""
+    return {key: value - before[key] for key, value in cache_counters().items()}
+
+
+def _add_counters(total: Dict[str, int], delta: Dict[str, int]) -> None:
+    """Accumulate cache counter deltas into ``total``."""
+    for key, value in delta.items():
+        total[key] = total.get(key, 0) + value
+
+
+def _build_row(
+    raw: str,
+    amount: float,
+    date: Optional[str],
+    unknown_merchants: Set[str],
+    history: Optional[Mapping[str, str]] = None,
+    fuzzy: Optional[TrigramIndex] = None,
+) -> Dict[str, Optional[str]]:
+    """Parse and categorize one transaction, noting unknown merchants.
+
+    ``history`` (normalized merchant -> category learned from past
+    transactions) is consulted before the keyword scan; ``fuzzy`` (a
+    ``TrigramIndex`` of names -> categories) is the last resort.
     """
+    merchant, parsed_date = _parse_description_cached(raw)
+    category = history.get(normalize_merchant(merchant)) if history else None
+    source = 'history' if category else None
+    if not category:
+        category = categorize_merchant(merchant)
+        source = 'keyword' if category else None
+    if not category and fuzzy is not None:
+        match = fuzzy.match(merchant)
+        if match:
+            category, source = match[1], 'fuzzy'
+    if not category:
+        unknown_merchants.add(merchant)
+        category = 'Uncategorized'
+    return {
+        'date': date if date is not None else parsed_date,
+        'merchant': merchant,
+        'amount': amount,
+        'category_guess': category,
+        'category_source': source,
+    }
 
-    results: List[Dict[str, Optional[str]]] = []
-    unknown_merchants: Set[str] = set()
-    with open(path, newline='') as f:
-        _skip_leading_empty(f)
-        start_pos = f.tell()
-        sample = f.read(2048)
-        f.seek(start_pos)
+
+# Candidate date layouts, most preferred first. US month-first wins when a
+# sample is ambiguous; day-first is only picked when the values rule it out.
+DATE_FORMATS = (
+    '%m/%d/%Y',
+    '%m/%d/%y',
+    '%Y-%m-%d',
+    '%Y/%m/%d',
+    '%m-%d-%Y',
+    '%d/%m/%Y',
+    '%d/%m/%y',
+    '%d.%m.%Y',
+    '%d-%m-%Y',
+    '%m/%d',
+    '%d/%m',
+)
+DATE_SAMPLE_SIZE = 200
+
+
+def _try_strptime(value: str, fmt: str) -> Optional[datetime]:
+    try:
+        return datetime.strptime(value, fmt)
+    except ValueError:
+        return None
+
+
+def infer_date_format(samples: Iterable[str]) -> Optional[str]:
+    """Return the format in ``DATE_FORMATS`` that parses the most samples."""
+    values = [v.strip() for v in samples if v and v.strip()]
+    if not values:
+        return None
+    best, best_hits = None, 0
+    for fmt in DATE_FORMATS:
+        hits = sum(1 for v in values if _try_strptime(v, fmt))
+        if hits > best_hits:
+            best, best_hits = fmt, hits
+        if hits == len(values):
+            break
+    return best
+
+
+class DateColumnParser:
+    """Parse one file's date column with a single inferred format.
+
+    The format is inferred from the first batch of values handed to
+    ``prime``; each distinct string is then parsed once. Values that do not
+    match are collected in ``unmatched`` as ``(row, value)`` pairs, ``row``
+    being the 1-based position among the imported rows, rather than being
+    dropped silently.
+    """
+
+    def __init__(self) -> None:
+        self.format: Optional[str] = None
+        self.unmatched: List[Tuple[int, str]] = []
+        self.rows = 0
+        self._parsed: Dict[str, Optional[date]] = {}
+
+    def prime(self, samples: Iterable[str]) -> None:
+        """Infer the column format from sample values if not yet known."""
+        if self.format is None:
+            self.format = infer_date_format(itertools.islice(samples, DATE_SAMPLE_SIZE))
+
+    def parse(self, value: Optional[str]) -> Optional[date]:
+        """Parse the next row's value; ``None`` when it does not match."""
+        self.rows += 1
+        text = (value or '').strip()
+        if text not in self._parsed:
+            dt = _try_strptime(text, self.format) if self.format and text else None
+            if dt is not None and '%Y' not in self.format and '%y' not in self.format:
+                dt = dt.replace(year=datetime.now().year)
+            self._parsed[text] = dt.date() if dt else None
+        result = self._parsed[text]
+        if result is None:
+            self.unmatched.append((self.rows, text))
+        return result
+
+
+def header_fingerprint(line: str) -> str:
+    """Key a header line for the layout registry, ignoring case and padding."""
+    return hashlib.sha1(line.strip().lower().encode('utf-8')).hexdigest()[:16]
+
+
+def _detect_layout(head: List[str], preamble: int) -> Dict[str, Any]:
+    """Sniff the dialect and resolve the columns from the peeked lines."""
+    sample = "".join(head)[:SNIFF_SAMPLE_SIZE]
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    layout: Dict[str, Any] = {
+        'dialect': {
+            'delimiter': dialect.delimiter,
+            'quotechar': dialect.quotechar,
+            'doublequote': dialect.doublequote,
+            'skipinitialspace': dialect.skipinitialspace,
+        },
+        'preamble': preamble,
+        'header': None,
+        'columns': None,
+        'fingerprint': None,
+    }
+    fieldnames = next(csv.reader(iter(head), dialect=dialect), None)
+    header_missing = False
+    if fieldnames and len(fieldnames) > 1:
         try:
-            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
-        except csv.Error:
-            dialect = csv.excel
-        reader = csv.DictReader(f, dialect=dialect)
-        header_missing = False
-        if reader.fieldnames and len(reader.fieldnames) > 1:
-            try:
-                float(reader.fieldnames[1].replace('$', '').replace(',', ''))
-                header_missing = True
-            except Exception:
-                header_missing = False
-        if header_missing or not reader.fieldnames or len(reader.fieldnames) < 2:
-            f.seek(start_pos)
-            reader = None
-        if reader and reader.fieldnames:
-            lower_fields = [h.lower().strip() for h in reader.fieldnames]
-            desc_field = None
-            amount_field = None
-            debit_field = None
-            credit_field = None
-            date_field = None
-            for name in reader.fieldnames:
-                lname = name.lower().strip()
-                if not desc_field and (lname in DESC_FIELDS or 'description' in lname):
-                    desc_field = name
-                if not amount_field and ('amount' in lname or lname in AMOUNT_FIELDS):
-                    if lname == 'debit':
-                        debit_field = name
-                    elif lname == 'credit':
-                        credit_field = name
-                    else:
-                        amount_field = name
-                if not date_field and ('date' in lname or lname in DATE_FIELDS):
-                    date_field = name
-            if not desc_field:
-                desc_field = reader.fieldnames[0]
-            if not amount_field and not (debit_field or credit_field):
-                # fall back to second column if amount fields not found
-                amount_field = reader.fieldnames[1] if len(reader.fieldnames) > 1 else None
-            if amount_field is None and not (debit_field or credit_field):
-                raise ValueError('CSV must have at least two columns')
-
-            for row in reader:
-                if not any(row.values()):
-                    continue
-                raw = (row.get(desc_field) or '').strip()
-                if debit_field or credit_field:
-                    debit = (row.get(debit_field) or '').strip()
-                    credit = (row.get(credit_field) or '').strip()
-                    amount_str = credit or debit
-                    if debit:
-                        amount_str = '-' + debit.lstrip('-')
-                else:
-                    amount_str = (row.get(amount_field) or '').strip()
-                if not raw or not amount_str:
-                    continue
-                amount_str = amount_str.replace('$', '').replace(',', '')
-                amount_str = amount_str.replace('(', '-').replace(')', '')
-                try:
-                    amount = float(amount_str)
-                except ValueError:
-                    # skip rows where amount is not numeric
-                    continue
-                parsed = parse_description(raw)
-                merchant = parsed['merchant'] or ''
-                category = categorize_merchant(merchant)
-                if not category:
-                    unknown_merchants.add(merchant)
-                    category = 'Uncategorized'
-                date = row.get(date_field) if date_field else parsed['date']
-                results.append({
-                    'date': date,
-                    'merchant': merchant,
-                    'amount': amount,
-                    'category_guess': category,
-                })
+            float(fieldnames[1].replace('$', '').replace(',', ''))
+            header_missing = True
+        except Exception:
+            header_missing = False
+    if header_missing or not fieldnames or len(fieldnames) < 2:
+        return layout
+
+    desc_field = None
+    amount_field = None
+    debit_field = None
+    credit_field = None
+    date_field = None
+    for name in fieldnames:
+        lname = name.lower().strip()
+        if not desc_field and (lname in DESC_FIELDS or 'description' in lname):
+            desc_field = name
+        if not amount_field and ('amount' in lname or lname in AMOUNT_FIELDS):
+            if lname == 'debit':
+                debit_field = name
+            elif lname == 'credit':
+                credit_field = name
+            else:
+                amount_field = name
+        if not date_field and ('date' in lname or lname in DATE_FIELDS):
+            date_field = name
+    if not desc_field:
+        desc_field = fieldnames[0]
+    if not amount_field and not (debit_field or credit_field):
+        # fall back to second column if amount fields not found
+        amount_field = fieldnames[1]
+    layout.update(
+        header=fieldnames,
+        fingerprint=header_fingerprint(head[0]),
+        columns={
+            'description': desc_field,
+            'amount': amount_field,
+            'debit': debit_field,
+            'credit': credit_field,
+            'date': date_field,
+        },
+    )
+    return layout
+
+
+def _records_from_layout(
+    lines: Iterable[str], layout: Dict[str, Any],
+) -> Iterator[Tuple[str, float, Optional[str]]]:
+    """Yield ``(description, amount, date)`` from lines starting at the header."""
+    reader = csv.reader(lines, **layout['dialect'])
+    if not layout['columns']:
+        # No header; description and amount are the first two columns
+        for row in reader:
+            if not row or all(not c.strip() for c in row):
+                continue
+            if len(row) < 2:
+                continue
+            amount = _parse_amount(row[1])
+            if amount is None:
+                continue
+            yield row[0], amount, None
+        return
+
+    # Later duplicates win, as with csv.DictReader
+    positions = {name.strip().lower(): i for i, name in enumerate(next(reader, []))}
+
+    def column(key: str) -> Optional[int]:
+        name = layout['columns'].get(key)
+        if not name:
+            return None
+        try:
+            return positions[name.strip().lower()]
+        except KeyError:
+            raise ValueError(f'Column {name!r} is not in the CSV header') from None
+
+    desc_i, amount_i = column('description'), column('amount')
+    debit_i, credit_i, date_i = column('debit'), column('credit'), column('date')
+
+    def cell(row: List[str], i: Optional[int]) -> Optional[str]:
+        return row[i] if i is not None and i < len(row) else None
+
+    for row in reader:
+        if not any(row):
+            continue
+        raw = (cell(row, desc_i) or '').strip()
+        if debit_i is not None or credit_i is not None:
+            debit = (cell(row, debit_i) or '').strip()
+            credit = (cell(row, credit_i) or '').strip()
+            amount_str = credit or debit
+            if debit:
+                amount_str = '-' + debit.lstrip('-')
         else:
-            # No header; fall back to simple reader
-            f.seek(start_pos)
-            reader2 = csv.reader(f, dialect=dialect)
-            for row in reader2:
-                if not row or all(not c.strip() for c in row):
-                    continue
-                if len(row) < 2:
-                    continue
-                raw, amount_str = row[0], row[1]
-                amount_str = amount_str.replace('$', '').replace(',', '')
-                amount_str = amount_str.replace('(', '-').replace(')', '')
-                try:
-                    amount = float(amount_str)
-                except ValueError:
-                    continue
-                parsed = parse_description(raw)
-                merchant = parsed['merchant'] or ''
-                category = categorize_merchant(merchant)
-                if not category:
-                    unknown_merchants.add(merchant)
-                    category = 'Uncategorized'
-                results.append({
-                    'date': parsed['date'],
-                    'merchant': merchant,
-                    'amount': amount,
-                    'category_guess': category,
-                })
+            amount_str = (cell(row, amount_i) or '').strip()
+        if not raw or not amount_str:
+            continue
+        amount = _parse_amount(amount_str)
+        if amount is None:
+            # skip rows where amount is not numeric
+            continue
+        yield raw, amount, cell(row, date_i)
+
+
+def _read_records(
+    f: Iterable[str], layouts: Optional[Any] = None,
+) -> Iterator[Tuple[str, float, Optional[str]]]:
+    """Detect the layout and yield ``(description, amount, date)`` per usable row.
+
+    ``layouts`` is an optional registry (``get``/``record`` by header
+    fingerprint). A header seen before reuses the saved layout and skips
+    sniffing and column detection entirely.
+    """
+    lines = iter(f)
+    if layouts is not None:
+        consumed: List[str] = []
+        for _ in range(PREAMBLE_LIMIT):
+            line = next(lines, "")
+            if line == "":
+                break
+            consumed.append(line)
+            if not line.strip():
+                continue
+            layout = layouts.get(header_fingerprint(line))
+            if layout is not None:
+                yield from _records_from_layout(itertools.chain([line], lines), layout)
+                return
+        lines = itertools.chain(consumed, lines)
+
+    head, preamble = _skip_leading_empty(lines, PREAMBLE_LIMIT)
+    # Extend the peek buffer until it covers the sniffer sample
+    size = sum(len(line) for line in head)
+    while size < SNIFF_SAMPLE_SIZE:
+        line = next(lines, "")
+        if line == "":
+            break
+        head.append(line)
+        size += len(line)
+    layout = _detect_layout(head, preamble)
+    if layouts is not None and layout['fingerprint']:
+        layouts.record(layout)
+    yield from _records_from_layout(itertools.chain(head, lines), layout)
+
+
+# Merchant history and fuzzy index shipped once to each worker process of a
+# parallel import
+_worker_history: Optional[Mapping[str, str]] = None
+_worker_fuzzy: Optional[TrigramIndex] = None
+
+
+def _set_worker_lookups(history: Optional[Mapping[str, str]],
+                        fuzzy: Optional[TrigramIndex]) -> None:
+    global _worker_history, _worker_fuzzy
+    _worker_history = history
+    _worker_fuzzy = fuzzy
+
+
+def _build_rows_chunk(
+    records: List[Tuple[str, float, Optional[str]]],
+) -> Tuple[List[Dict[str, Optional[str]]], Set[str], Dict[str, int]]:
+    """Parse and categorize a chunk of records; runs in a worker process.
+
+    Also returns the worker's cache hits and misses for the chunk.
+    """
+    unknown_merchants: Set[str] = set()
+    before = cache_counters()
+    rows = [
+        _build_row(raw, amount, date, unknown_merchants, _worker_history, _worker_fuzzy)
+        for raw, amount, date in records
+    ]
+    return rows, unknown_merchants, _counters_since(before)
+
+
+def _iter_rows(
+    f: Iterable[str],
+    unknown_merchants: Set[str],
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    cache_stats: Optional[Dict[str, int]] = None,
+    layouts: Optional[Any] = None,
+    history: Optional[Mapping[str, str]] = None,
+    fuzzy: Optional[TrigramIndex] = None,
+) -> Iterator[Dict[str, Optional[str]]]:
+    """Yield parsed rows from a text stream as they are read.
+
+    With ``workers`` > 1 the description parsing and categorization of each
+    ``chunk_size`` rows (default ``PARALLEL_CHUNK_SIZE``) runs in a process
+    pool; rows still come out in file order. Cache hits and misses are added
+    to ``cache_stats`` when given. Worker processes count only their own
+    chunks; in-process parsing reads the shared ``lru_cache`` counters, so
+    lookups by other threads parsing at the same moment are included.
+    """
+    if cache_stats is None:
+        cache_stats = {}
+    records = _read_records(f, layouts)
+    if not workers or workers < 2:
+        # Counters are read around each chunk's parsing only, not while the
+        # caller persists rows, to keep other threads' lookups out of them
+        for chunk in _iter_batches(records, chunk_size or PARALLEL_CHUNK_SIZE):
+            before = cache_counters()
+            rows = [
+                _build_row(raw, amount, date, unknown_merchants, history, fuzzy)
+                for raw, amount, date in chunk
+            ]
+            _add_counters(cache_stats, _counters_since(before))
+            yield from rows
+        return
+
+    pending: Deque[Future] = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_set_worker_lookups,
+                             initargs=(history, fuzzy)) as pool:
+        for chunk in _iter_batches(records, chunk_size or PARALLEL_CHUNK_SIZE):
+            pending.append(pool.submit(_build_rows_chunk, chunk))
+            # Bound the chunks in flight so huge files are not read ahead
+            if len(pending) < workers * 2:
+                continue
+            rows, unknown, counters = pending.popleft().result()
+            unknown_merchants.update(unknown)
+            _add_counters(cache_stats, counters)
+            yield from rows
+        while pending:
+            rows, unknown, counters = pending.popleft().result()
+            unknown_merchants.update(unknown)
+            _add_counters(cache_stats, counters)
+            yield from rows
+
+
+def iter_import_csv(
+    source: Union[str, os.PathLike, TextIO],
+    unknown_merchants: Optional[Set[str]] = None,
+    batch_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    cache_stats: Optional[Dict[str, int]] = None,
+    layouts: Optional[Any] = None,
+    history: Optional[Mapping[str, str]] = None,
+    fuzzy: Optional[TrigramIndex] = None,
+) -> Iterator[Any]:
+    """Stream parsed transactions from a CSV file path or text stream.
+
+    Yields one row dict at a time, or lists of up to ``batch_size`` rows when
+    a batch size is given, while the file is still being read. Merchants with
+    no keyword match are added to ``unknown_merchants`` as they are seen.
+    Streams are read forward only, so uploads need not be saved to disk first.
+    ``workers`` > 1 parses row chunks in that many processes. Description and
+    category cache hits and misses are accumulated into ``cache_stats``.
+    ``layouts`` (an ``import_layouts.LayoutRegistry``) remembers detected
+    layouts by header fingerprint and reuses them on later imports.
+    ``history`` maps normalized merchants to categories learned from past
+    transactions and takes precedence over keywords. ``fuzzy`` (a
+    ``merchant_index.TrigramIndex``) categorizes merchants that miss both by
+    their closest known name. Each row's ``category_source`` says which one
+    matched.
+    """
+
+    if unknown_merchants is None:
+        unknown_merchants = set()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, newline='', encoding=CSV_ENCODING, errors=CSV_ENCODING_ERRORS) as f:
+            rows = _iter_rows(f, unknown_merchants, workers, cache_stats=cache_stats,
+                              layouts=layouts, history=history, fuzzy=fuzzy)
+            yield from _iter_batches(rows, batch_size)
+    else:
+        rows = _iter_rows(source, unknown_merchants, workers, cache_stats=cache_stats,
+                          layouts=layouts, history=history, fuzzy=fuzzy)
+        yield from _iter_batches(rows, batch_size)
+
+
+def _iter_batches(rows: Iterator[Any], batch_size: Optional[int]) -> Iterator[Any]:
+    """Pass rows through, or group them into lists of ``batch_size``."""
+    if not batch_size:
+        yield from rows
+        return
+    batch: List[Dict[str, Optional[str]]] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_csv(
+    source: Union[str, os.PathLike, TextIO],
+    workers: Optional[int] = None,
+) -> Tuple[List[Dict[str, Optional[str]]], Set[str]]:
+    """Import CSV of transactions from a path or text stream.
+
+    Returns a tuple of (rows, unknown_merchants).
+    """
+
+    unknown_merchants: Set[str] = set()
+    results = list(iter_import_csv(source, unknown_merchants, workers=workers))
     return results, unknown_merchants
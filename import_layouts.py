@@ -0,0 +1,102 @@
+"""Persistent registry of bank CSV layouts.
+
+The importer fingerprints the header line of each file. The first time a
+header is seen its detected dialect, preamble length and column mapping are
+stored here, so later imports of the same bank export skip detection. Saved
+layouts can be listed and overridden through the API.
+"""
+
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+COLUMN_KEYS = ('description', 'amount', 'debit', 'credit', 'date')
+DIALECT_KEYS = ('delimiter', 'quotechar', 'doublequote', 'skipinitialspace')
+# Next to the module, like category_keywords.json, not the working directory
+DEFAULT_LAYOUTS_PATH = os.path.join(os.path.dirname(__file__), 'import_layouts.json')
+
+
+class LayoutRegistry:
+    """JSON-file backed store of CSV layouts keyed by header fingerprint."""
+
+    def __init__(self, path: str = DEFAULT_LAYOUTS_PATH) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r', encoding='utf-8') as fh:
+                self._layouts: Dict[str, Dict[str, Any]] = json.load(fh)
+        except FileNotFoundError:
+            self._layouts = {}
+
+    def _save(self) -> None:
+        """Atomically rewrite the registry file."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.import_layouts.', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as fh:
+                json.dump(self._layouts, fh, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def get(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Saved layout for a header fingerprint, if any."""
+        return self._layouts.get(fingerprint)
+
+    def all(self) -> List[Dict[str, Any]]:
+        """Every saved layout, most recently updated first."""
+        return sorted(self._layouts.values(), key=lambda l: l['updated_at'], reverse=True)
+
+    def record(self, layout: Dict[str, Any]) -> None:
+        """Remember a freshly detected layout unless one is already saved."""
+        with self._lock:
+            if layout['fingerprint'] in self._layouts:
+                return
+            now = datetime.now().isoformat(timespec='seconds')
+            self._layouts[layout['fingerprint']] = dict(
+                layout, source='detected', created_at=now, updated_at=now
+            )
+            self._save()
+
+    def override(self, fingerprint: str, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply manual dialect/column changes to a saved layout.
+
+        Raises ``KeyError`` for an unknown fingerprint and ``ValueError`` for
+        invalid changes.
+        """
+        with self._lock:
+            layout = json.loads(json.dumps(self._layouts[fingerprint]))
+            for key, value in (changes.get('columns') or {}).items():
+                if key not in COLUMN_KEYS:
+                    raise ValueError(f'Unknown column role {key!r}')
+                if value and value not in layout['header']:
+                    raise ValueError(f'Column {value!r} is not in the header')
+                layout['columns'][key] = value or None
+            if not layout['columns']['description']:
+                raise ValueError('A description column is required')
+            if not (layout['columns']['amount'] or layout['columns']['debit']
+                    or layout['columns']['credit']):
+                raise ValueError('An amount, debit or credit column is required')
+            for key, value in (changes.get('dialect') or {}).items():
+                if key not in DIALECT_KEYS:
+                    raise ValueError(f'Unknown dialect setting {key!r}')
+                if key in ('delimiter', 'quotechar') and (not isinstance(value, str) or len(value) != 1):
+                    raise ValueError(f'{key} must be a single character')
+                layout['dialect'][key] = value
+            layout['source'] = 'manual'
+            layout['updated_at'] = datetime.now().isoformat(timespec='seconds')
+            self._layouts[fingerprint] = layout
+            self._save()
+            return layout
+
+    def remove(self, fingerprint: str) -> bool:
+        """Forget a layout so the next import detects it again."""
+        with self._lock:
+            if self._layouts.pop(fingerprint, None) is None:
+                return False
+            self._save()
+            return True
@@ -0,0 +1,170 @@
+"""Merchant to category index learned from transaction history.
+
+Past transactions pair a merchant with the category the user settled on. The
+index keeps per-merchant category counts so the importer can reuse the
+majority category before falling back to keyword matching. A trigram index
+over known merchants and keywords provides fuzzy matches for the rest.
+"""
+
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+_WORD_RE = re.compile(r'[A-Z0-9]+')
+
+
+def normalize_merchant(merchant: Optional[str]) -> str:
+    """Upper-case a merchant name and collapse punctuation and spacing."""
+    return ' '.join(_WORD_RE.findall((merchant or '').upper()))
+
+
+class MerchantCategoryIndex:
+    """Normalized merchant -> majority category, maintained incrementally.
+
+    Categories listed in ``ignored`` (e.g. a catch-all "Uncategorized") are
+    never learned.
+    """
+
+    def __init__(self, ignored: Iterable[str] = ()) -> None:
+        self.ignored = frozenset(ignored)
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Counter] = {}
+        self._majority: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._majority)
+
+    def _refresh(self, key: str) -> None:
+        counts = self._counts.get(key)
+        if counts:
+            self._majority[key] = counts.most_common(1)[0][0]
+        else:
+            self._counts.pop(key, None)
+            self._majority.pop(key, None)
+
+    def load(self, rows: Iterable[Tuple[Optional[str], str, int]]) -> None:
+        """Replace the index with ``(merchant, category, count)`` rows."""
+        counts: Dict[str, Counter] = {}
+        for merchant, category, count in rows:
+            key = normalize_merchant(merchant)
+            if key and category and category not in self.ignored:
+                counts.setdefault(key, Counter())[category] += count
+        with self._lock:
+            self._counts = counts
+            self._majority = {key: c.most_common(1)[0][0] for key, c in counts.items()}
+
+    def add(self, merchant: Optional[str], category: Optional[str], count: int = 1) -> None:
+        """Record ``count`` transactions of ``merchant`` filed under ``category``."""
+        key = normalize_merchant(merchant)
+        if not key or not category or category in self.ignored:
+            return
+        with self._lock:
+            self._counts.setdefault(key, Counter())[category] += count
+            self._refresh(key)
+
+    def remove(self, merchant: Optional[str], category: Optional[str], count: int = 1) -> None:
+        """Forget ``count`` transactions of ``merchant`` under ``category``."""
+        key = normalize_merchant(merchant)
+        with self._lock:
+            counts = self._counts.get(key)
+            if not counts or not category:
+                return
+            counts[category] -= count
+            if counts[category] <= 0:
+                del counts[category]
+            self._refresh(key)
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """Majority category for an already normalized merchant."""
+        return self._majority.get(key, default)
+
+    def lookup(self, merchant: Optional[str]) -> Optional[str]:
+        """Majority category for a raw merchant name."""
+        return self._majority.get(normalize_merchant(merchant))
+
+    def snapshot(self) -> Dict[str, str]:
+        """Plain copy of the majority mapping, e.g. for worker processes."""
+        with self._lock:
+            return dict(self._majority)
+
+
+def trigrams(text: str) -> Set[str]:
+    """Character trigrams of a normalized string, padded to mark word edges."""
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Inverted index from character trigrams to terms for fuzzy lookup.
+
+    ``match`` only visits terms sharing at least one trigram with the query
+    (via the posting lists), so lookups do not scan every term. Similarity
+    is the Dice coefficient of the trigram sets; matches below ``threshold``
+    are ignored.
+    """
+
+    def __init__(self, threshold: float = 0.5) -> None:
+        self.threshold = threshold
+        self._terms: List[str] = []
+        self._values: List[Any] = []
+        self._sizes: List[int] = []
+        self._ids: Dict[str, int] = {}
+        self._postings: Dict[str, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def add(self, term: Optional[str], value: Any = None) -> None:
+        """Index a term; the first value added for a normalized term is kept."""
+        key = normalize_merchant(term)
+        if not key or key in self._ids:
+            return
+        term_id = len(self._terms)
+        grams = trigrams(key)
+        self._ids[key] = term_id
+        self._terms.append(key)
+        self._values.append(value)
+        self._sizes.append(len(grams))
+        for gram in grams:
+            self._postings.setdefault(gram, []).append(term_id)
+
+    def match(self, term: Optional[str]) -> Optional[Tuple[str, Any, float]]:
+        """Closest indexed ``(term, value, score)`` at or above the threshold."""
+        key = normalize_merchant(term)
+        if not key:
+            return None
+        grams = trigrams(key)
+        shared: Counter = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        best: Optional[Tuple[str, Any, float]] = None
+        for term_id, common in shared.items():
+            score = 2 * common / (len(grams) + self._sizes[term_id])
+            if score >= self.threshold and (best is None or score > best[2]):
+                best = (self._terms[term_id], self._values[term_id], round(score, 3))
+        return best
+
+
+def cluster_merchants(merchants: Iterable[str], threshold: float = 0.5) -> List[List[str]]:
+    """Group near-duplicate merchant names.
+
+    Each name joins the cluster of its closest representative when the
+    trigram similarity reaches ``threshold``, otherwise it starts a new
+    cluster. Representatives live in a ``TrigramIndex``, so names are never
+    compared pairwise. Largest clusters come first.
+    """
+    representatives = TrigramIndex(threshold)
+    clusters: Dict[str, List[str]] = {}
+    for name in sorted(set(merchants)):
+        found = representatives.match(name)
+        if found:
+            clusters[found[0]].append(name)
+            continue
+        key = normalize_merchant(name)
+        if key in clusters:
+            clusters[key].append(name)
+            continue
+        representatives.add(name)
+        clusters[key] = [name]
+    return sorted(clusters.values(), key=lambda c: (-len(c), c[0]))
@@ -2,6 +2,10 @@
     let currentMonth = localStorage.getItem('selectedMonth') || new Date().toISOString().slice(0, 7);
     localStorage.setItem('selectedMonth', currentMonth);
     let editingTransactionId = null;
+    const PAGE_SIZE = 100;
+    let nextCursor = null;
+    let loadingPage = false;
+    let listRequestId = 0;
 
     $(document).ready(function() {
         $('#monthSelector').val(currentMonth);
@@ -23,6 +27,8 @@
         });
 
         $('#csvFileInput').change(handleCsvImport);
+
+        $(window).on('scroll', maybeLoadMoreTransactions);
     });
 
     function handleCsvImport() {
@@ -214,36 +220,67 @@
             }
         });
         if (!inserted) {
+            // Older than everything loaded so far; a later page will include it
+            if (nextCursor) {
+                checkEmptyState();
+                return;
+            }
             tbody.append(row);
         }
         checkEmptyState();
     }
 
     function loadTransactions() {
+        const tbody = $('#transactionTableBody');
+        const emptyState = $('#emptyState');
+        tbody.empty();
+        emptyState.show().html('<div class="spinner-border text-secondary mb-3" role="status"></div><h5>Loading...</h5>');
+
+        nextCursor = null;
+        listRequestId++;
+        fetchTransactionPage(true);
+    }
+
+    function fetchTransactionPage(firstPage) {
+        const requestId = listRequestId;
         const params = {
             month: $('#monthSelector').val(),
             type: $('#typeFilter').val(),
             category: $('#categoryFilter').val(),
-            search: $('#searchFilter').val()
+            search: $('#searchFilter').val(),
+            limit: PAGE_SIZE
         };
+        if (nextCursor) params.cursor = nextCursor;
 
-        const tbody = $('#transactionTableBody');
-        const emptyState = $('#emptyState');
-        tbody.empty();
-        emptyState.show().html('<div class="spinner-border text-secondary mb-3" role="status"></div><h5>Loading...</h5>');
+        loadingPage = true;
+        $.get('/api/transactions', params, function(page) {
+            // Filters changed while this page was in flight
+            if (requestId !== listRequestId) return;
 
-        $.get('/api/transactions', params, function(transactions) {
-            if (transactions.length === 0) {
+            nextCursor = page.next_cursor;
+            const emptyState = $('#emptyState');
+            if (firstPage && page.transactions.length === 0) {
                 emptyState.html('<i class="fas fa-receipt"></i><h5>No transactions found</h5><p class="mb-0">Try adjusting your filters or add a new transaction.</p>');
                 return;
             }
 
             emptyState.hide();
-            const html = transactions.map(renderTransactionRow).join('');
-            tbody.html(html);
+            $('#transactionTableBody').append(page.transactions.map(renderTransactionRow).join(''));
+        }).always(function() {
+            if (requestId !== listRequestId) return;
+            loadingPage = false;
+            // Keep going until the page can scroll or everything is loaded
+            maybeLoadMoreTransactions();
         });
     }
 
+    function maybeLoadMoreTransactions() {
+        if (!nextCursor || loadingPage) return;
+        if ($(window).scrollTop() + $(window).height() >= $(document).height() - 300) {
+            fetchTransactionPage(false);
+        }
+    }
+
     function saveTransaction() {
         const button = $('#addTransactionModal .btn-modern-primary');
         const formData = $('#addTransactionForm').serializeArray();
@@ -0,0 +1,8 @@
+import os
+import tempfile
+
+# The database URI and layouts path are read when ``app`` is first imported,
+# whichever test module does that; point them at scratch storage up front.
+_scratch = tempfile.mkdtemp(prefix='budget-tests-')
+os.environ.setdefault('BUDGET_DB_URI', 'sqlite:///' + os.path.join(_scratch, 'test.db'))
+os.environ.setdefault('BUDGET_LAYOUTS_PATH', os.path.join(_scratch, 'layouts.json'))
@@ -1,5 +1,6 @@
 import os
 import csv
+import json
 import pytest
 
 
@@ -8,6 +9,7 @@ def client(tmp_path):
     os.environ['BUDGET_DB_URI'] = 'sqlite:///' + str(tmp_path / 'test.db')
     from app import app, db, init_database
     app.config['TESTING'] = True
+    app.config['IMPORT_LAYOUTS_PATH'] = str(tmp_path / 'layouts.json')
     with app.app_context():
         db.create_all()
         init_database()
@@ -52,7 +54,16 @@ def test_get_budget(client):
     assert isinstance(data, list)
 
 
-def test_add_category_keyword_endpoint(client):
+@pytest.fixture
+def keyword_store(tmp_path, monkeypatch):
+    import categories
+    monkeypatch.setattr(categories, '_KEYWORDS_PATH', str(tmp_path / 'keywords.json'))
+    monkeypatch.setattr(categories, '_JOURNAL_PATH', str(tmp_path / 'keywords.journal'))
+    monkeypatch.setattr(categories, '_journal_entries', 0)
+    return tmp_path
+
+
+def test_add_category_keyword_endpoint(client, keyword_store):
     resp = client.post('/api/category-keywords', json={'keyword': 'MyCafe', 'category': 'Coffee'})
     assert resp.status_code == 200
     from categories import categorize_merchant
@@ -78,6 +89,10 @@ def test_import_csv_endpoint_handles_year_and_blanks(client, tmp_path):
     with file_path.open('rb') as f:
         resp = client.post('/api/import-csv', data={'file': (f, 'tx.csv')}, content_type='multipart/form-data')
     assert resp.status_code == 200
+    assert resp.get_json()['cache']['description_misses'] >= 1
+    assert resp.get_json()['cache']['scope'] == 'process'
+    # The upload is read in place, never copied to disk
+    assert not os.path.exists('uploads/tx.csv')
 
     from datetime import date as date_cls
     with client.application.app_context():
@@ -240,3 +255,628 @@ def test_refresh_funds_recalculates_balance(client):
     resp = client.get('/api/funds')
     fund = next(f for f in resp.get_json() if f['name'] == 'Emergency Fund')
     assert fund['balance'] == 200
+
+
+def test_rollup_tracks_transaction_changes(client):
+    resp = client.post('/api/categories', json={'name': 'RollupCat', 'type': 'expense'})
+    cat_id = resp.get_json()['id']
+
+    def post(amount, date):
+        resp = client.post('/api/transactions', json={
+            'amount': amount, 'transaction_type': 'expense',
+            'category_id': cat_id, 'date': date
+        })
+        return resp.get_json()['id']
+
+    first = post('10', '2001-01-05')
+    post('5', '2001-01-20')
+    resp = client.get('/api/dashboard-data/2001-01')
+    assert resp.get_json()['total_expenses'] == 15
+
+    # editing the only transaction in a bucket keeps the bucket
+    single = post('3', '2001-03-01')
+    client.put(f'/api/transactions/{single}', json={'amount': '4'})
+    assert client.get('/api/dashboard-data/2001-03').get_json()['total_expenses'] == 4
+    client.delete(f'/api/transactions/{single}')
+
+    # moving a transaction to another month updates both buckets
+    client.put(f'/api/transactions/{first}', json={'amount': '12', 'date': '2001-02-01'})
+    assert client.get('/api/dashboard-data/2001-01').get_json()['total_expenses'] == 5
+    assert client.get('/api/dashboard-data/2001-02').get_json()['total_expenses'] == 12
+
+    client.delete(f'/api/transactions/{first}')
+    assert client.get('/api/dashboard-data/2001-02').get_json()['total_expenses'] == 0
+
+    from app import MonthlyRollup, rebuild_rollups
+    with client.application.app_context():
+        before = {(r.month, r.category_id, r.transaction_type): (r.total, r.count)
+                  for r in MonthlyRollup.query.all()}
+        rebuild_rollups()
+        after = {(r.month, r.category_id, r.transaction_type): (r.total, r.count)
+                 for r in MonthlyRollup.query.all()}
+    assert before == after
+    assert {k: v for k, v in after.items() if k[1] == cat_id} == {('2001-01', cat_id, 'expense'): (5, 1)}
+
+
+def test_delete_category_clears_rollup(client):
+    resp = client.post('/api/categories', json={'name': 'Doomed', 'type': 'expense'})
+    cat_id = resp.get_json()['id']
+    client.post('/api/transactions', json={
+        'amount': '40', 'transaction_type': 'expense',
+        'category_id': cat_id, 'date': '2002-03-01'
+    })
+    assert client.get('/api/dashboard-data/2002-03').get_json()['total_expenses'] == 40
+
+    client.delete(f'/api/categories/{cat_id}')
+    assert client.get('/api/dashboard-data/2002-03').get_json()['total_expenses'] == 0
+
+
+def count_queries(app, func):
+    """Return how many SQL statements ``func`` executes."""
+    from sqlalchemy import event
+    from app import db
+    statements = []
+
+    def before_execute(conn, cursor, statement, params, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_execute)
+    try:
+        func()
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_execute)
+    return len(statements)
+
+
+def test_budget_comparison_constant_queries(client):
+    resp = client.post('/api/categories', json={'name': 'CmpCat', 'type': 'expense', 'monthly_budget': 50})
+    cat_id = resp.get_json()['id']
+    client.post('/api/budget/2003-04/update', json={'category_id': cat_id, 'amount': 80})
+    client.post('/api/transactions', json={
+        'amount': '30', 'transaction_type': 'expense',
+        'category_id': cat_id, 'date': '2003-04-10'
+    })
+
+    resp = client.get('/api/budget-comparison/2003-04')
+    row = next(r for r in resp.get_json() if r['category'] == 'CmpCat')
+    assert row['budgeted'] == 80 and row['actual'] == 30
+    assert row['difference'] == 50 and row['status'] == 'under'
+
+    app = client.application
+    before = count_queries(app, lambda: client.get('/api/budget-comparison/2003-04'))
+    for i in range(20):
+        client.post('/api/categories', json={'name': f'CmpExtra{i}', 'type': 'expense'})
+    after = count_queries(app, lambda: client.get('/api/budget-comparison/2003-04'))
+    assert before == after == 1
+
+
+def test_budget_for_month_single_query(client):
+    resp = client.post('/api/categories', json={'name': 'BudgetJoin', 'type': 'expense', 'monthly_budget': 25})
+    cat_id = resp.get_json()['id']
+    client.post('/api/budget/2004-05/update', json={'category_id': cat_id, 'amount': 60})
+    client.post('/api/budget/2004-05/update', json={'category_id': cat_id, 'amount': 70})
+
+    data = client.get('/api/budget/2004-05').get_json()
+    row = next(c for c in data if c['id'] == cat_id)
+    assert row['monthly_budget'] == 70 and row['is_custom'] is True
+
+    from app import Budget
+    with client.application.app_context():
+        assert Budget.query.filter_by(month='2004-05', category_id=cat_id).count() == 1
+
+    assert count_queries(client.application, lambda: client.get('/api/budget/2004-05')) == 1
+
+
+def test_annual_overview_grouped(client):
+    resp = client.post('/api/categories', json={'name': 'AnnualInc', 'type': 'income'})
+    inc_id = resp.get_json()['id']
+    resp = client.post('/api/categories', json={'name': 'AnnualExp', 'type': 'expense'})
+    exp_id = resp.get_json()['id']
+    for amount, tx_type, cat_id, date in [
+        ('100', 'income', inc_id, '2005-01-15'),
+        ('40', 'expense', exp_id, '2005-01-20'),
+        ('10', 'deduction', inc_id, '2005-03-01'),
+    ]:
+        client.post('/api/transactions', json={
+            'amount': amount, 'transaction_type': tx_type,
+            'category_id': cat_id, 'date': date
+        })
+
+    data = client.get('/api/reports/annual-overview/2005').get_json()
+    assert len(data['months']) == 12
+    assert data['monthly_income'][0] == 100 and data['monthly_expenses'][0] == 40
+    assert data['monthly_expenses'][2] == 10
+    assert data['total_saved'] == 50
+
+    assert count_queries(client.application, lambda: client.get('/api/reports/annual-overview/2005')) == 1
+
+
+def test_month_series_reports_single_query(client):
+    resp = client.post('/api/categories', json={'name': 'SeriesCat', 'type': 'expense'})
+    cat_id = resp.get_json()['id']
+    for amount, date in [('20', '2006-02-03'), ('5', '2006-02-20'), ('7', '2008-12-31')]:
+        client.post('/api/transactions', json={
+            'amount': amount, 'transaction_type': 'expense',
+            'category_id': cat_id, 'date': date
+        })
+
+    url = '/api/reports/spending-trends?start=2006-01&end=2010-12'
+    data = client.get(url).get_json()
+    assert len(data['months']) == 60
+    assert data['expenses'][:3] == [0, 25, 0]
+    assert data['months'][35] == 'Dec 2008' and data['expenses'][35] == 7
+    assert count_queries(client.application, lambda: client.get(url)) == 1
+
+    url = '/api/reports/period-comparison?start1=2006-01&end1=2006-03&start2=2008-11&end2=2009-01'
+    data = client.get(url).get_json()
+    assert data['period1']['totals'] == [0, 25, 0]
+    assert data['period2']['totals'] == [0, 7, 0]
+    assert count_queries(client.application, lambda: client.get(url)) == 2
+
+
+def test_sankey_cached_per_period(client):
+    ids = {}
+    for name in ['SankeyBig', 'SankeyTiny1', 'SankeyTiny2']:
+        ids[name] = client.post('/api/categories', json={'name': name, 'type': 'expense'}).get_json()['id']
+
+    def add(amount, name, date):
+        return client.post('/api/transactions', json={
+            'amount': amount, 'transaction_type': 'expense',
+            'category_id': ids[name], 'date': date
+        }).get_json()['id']
+
+    add('500', 'SankeyBig', '2007-06-01')
+    add('2', 'SankeyTiny1', '2007-06-02')
+    tx_id = add('3', 'SankeyTiny2', '2007-06-03')
+
+    url = '/api/sankey-data/monthly/2007-06'
+    names = {n['name'] for n in client.get(url).get_json()['nodes']}
+    assert {'SankeyBig', 'SankeyTiny1', 'SankeyTiny2'} <= names
+    assert count_queries(client.application, lambda: client.get(url)) == 0
+
+    # a change in another period keeps the cached entry
+    add('1', 'SankeyBig', '2007-07-01')
+    assert count_queries(client.application, lambda: client.get(url)) == 0
+
+    # a change in the period refreshes it
+    client.put(f'/api/transactions/{tx_id}', json={'amount': '4'})
+    data = client.get(url).get_json()
+    tiny2 = next(i for i, n in enumerate(data['nodes']) if n['name'] == 'SankeyTiny2')
+    assert next(l['value'] for l in data['links'] if l['target'] == tiny2) == 4
+
+    data = client.get(url + '?threshold=0.05').get_json()
+    names = [n['name'] for n in data['nodes']]
+    assert 'SankeyTiny1' not in names and 'SankeyTiny2' not in names
+    other = names.index('Other')
+    assert next(l['value'] for l in data['links'] if l['target'] == other) == 6
+
+
+def test_sankey_cache_dropped_only_after_commit(client):
+    import app as app_module
+    from app import _sankey_cache, db, invalidate_sankey_cache, store_sankey_flows
+    key = ('monthly', '2019-05')
+    with client.application.app_context():
+        _sankey_cache[key] = 'cached'
+        db.session.execute(db.select(app_module.MonthlyRollup).limit(1))
+        invalidate_sankey_cache('2019-05')
+        assert _sankey_cache[key] == 'cached'
+        db.session.rollback()
+        db.session.commit()
+        assert _sankey_cache[key] == 'cached'
+
+        # A read that started before the commit must not re-cache what it saw
+        generation = app_module._sankey_generation
+        invalidate_sankey_cache('2019-05')
+        db.session.commit()
+        assert key not in _sankey_cache
+        store_sankey_flows(key, 'stale', generation)
+        assert key not in _sankey_cache
+
+
+def test_list_transactions_keyset_pagination(client):
+    cat_id = client.post('/api/categories', json={'name': 'PageCat', 'type': 'expense'}).get_json()['id']
+    for day in ['01', '02', '02', '03', '04']:
+        client.post('/api/transactions', json={
+            'amount': '1', 'transaction_type': 'expense',
+            'category_id': cat_id, 'date': f'2009-01-{day}'
+        })
+
+    seen = []
+    cursor = None
+    while True:
+        params = {'category': cat_id, 'limit': 2, 'fields': 'id,date', 'total': 1}
+        if cursor:
+            params['cursor'] = cursor
+        page = client.get('/api/transactions', query_string=params).get_json()
+        assert page['total'] == 5
+        assert all(set(t) == {'id', 'date'} for t in page['transactions'])
+        seen.extend(page['transactions'])
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+
+    assert len(seen) == 5 and len({t['id'] for t in seen}) == 5
+    keys = [(t['date'], t['id']) for t in seen]
+    assert keys == sorted(keys, reverse=True)
+
+    # without a limit the endpoint keeps returning a plain list
+    data = client.get('/api/transactions', query_string={'category': cat_id}).get_json()
+    assert len(data) == 5 and data[0]['category'] == 'PageCat'
+
+    resp = client.get('/api/transactions', query_string={'fields': 'id,bogus'})
+    assert resp.status_code == 400
+
+
+def test_transaction_search_full_text(client):
+    from app import migrate_database
+    with client.application.app_context():
+        migrate_database()
+
+    cat_id = client.post('/api/categories', json={'name': 'SearchCat', 'type': 'expense'}).get_json()['id']
+    for desc, merchant in [('Weekly groceries', 'ZORBLAX MARKET'),
+                           ('Zorblax snacks zorblax treats', 'ZORBLAX MARKET'),
+                           ('Coffee', 'QUUXBUCKS')]:
+        client.post('/api/transactions', json={
+            'amount': '3', 'transaction_type': 'expense', 'category_id': cat_id,
+            'date': '2010-02-01', 'description': desc, 'merchant': merchant
+        })
+
+    def search(term, **extra):
+        params = {'search': term, 'category': cat_id}
+        params.update(extra)
+        return client.get('/api/transactions', query_string=params).get_json()
+
+    # prefix and multi-term matching
+    assert {t['merchant'] for t in search('zorbl')} == {'ZORBLAX MARKET'}
+    assert [t['description'] for t in search('zorblax groc')] == ['Weekly groceries']
+    # ranked: the row mentioning the term most comes first
+    ranked = search('zorblax', sort='relevance')
+    assert ranked[0]['description'] == 'Zorblax snacks zorblax treats'
+
+    # the index follows updates and deletes
+    tx_id = search('quuxbucks')[0]['id']
+    client.put(f'/api/transactions/{tx_id}', json={'merchant': 'FLIBBER CAFE'})
+    assert search('quuxbucks') == []
+    assert [t['id'] for t in search('flibber')] == [tx_id]
+    client.delete(f'/api/transactions/{tx_id}')
+    assert search('flibber') == []
+
+
+def test_transaction_search_like_fallback(client, monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(app_module, 'fts_available', lambda: False)
+    cat_id = client.post('/api/categories', json={'name': 'LikeCat', 'type': 'expense'}).get_json()['id']
+    client.post('/api/transactions', json={
+        'amount': '3', 'transaction_type': 'expense', 'category_id': cat_id,
+        'date': '2010-03-01', 'merchant': 'STARBUCKS'
+    })
+    data = client.get('/api/transactions', query_string={'search': 'bucks', 'category': cat_id}).get_json()
+    assert [t['merchant'] for t in data] == ['STARBUCKS']
+
+
+def test_export_csv_streams_date_range(client):
+    cat_id = client.post('/api/categories', json={'name': 'ExportCat', 'type': 'expense'}).get_json()['id']
+    for date in ['2011-01-31', '2011-02-01', '2011-02-28', '2011-03-01']:
+        client.post('/api/transactions', json={
+            'amount': '2.5', 'transaction_type': 'expense', 'category_id': cat_id,
+            'date': date, 'merchant': 'EXPORTER'
+        })
+
+    resp = client.get('/api/export/csv?start=2011-02-01&end=2011-02-28')
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    rows = list(csv.reader(resp.get_data(as_text=True).splitlines()))
+    assert rows[0][0] == 'Date'
+    assert [r[0] for r in rows[1:]] == ['2011-02-28', '2011-02-01']
+    assert rows[1][2] == 'ExportCat' and rows[1][4] == 'EXPORTER'
+
+    assert client.get('/api/export/csv?start=02/01/2011').status_code == 400
+
+
+def test_export_json_and_ndjson_stream(client):
+    cat_id = client.post('/api/categories', json={'name': 'JsonExportCat', 'type': 'expense'}).get_json()['id']
+    client.post('/api/transactions', json={
+        'amount': '9', 'transaction_type': 'expense', 'category_id': cat_id, 'date': '2012-05-05'
+    })
+    client.post('/api/budget/2012-05/update', json={'category_id': cat_id, 'amount': 20})
+
+    resp = client.get('/api/export/json')
+    assert resp.is_streamed
+    data = json.loads(resp.get_data(as_text=True))
+    assert set(data) == {'export_date', 'categories', 'transactions', 'funds', 'budgets'}
+    assert any(t['category'] == 'JsonExportCat' and t['amount'] == 9 for t in data['transactions'])
+    assert {'month': '2012-05', 'category': 'JsonExportCat', 'amount': 20} in data['budgets']
+
+    resp = client.get('/api/export/json?format=ndjson')
+    assert resp.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert lines[0]['section'] == 'export'
+    counts = {}
+    for line in lines[1:]:
+        counts[line['section']] = counts.get(line['section'], 0) + 1
+    assert counts['transactions'] == len(data['transactions'])
+    assert counts['categories'] == len(data['categories'])
+
+
+def test_import_csv_bulk_persistence(client, tmp_path):
+    def write_csv(n, amount='-1.00'):
+        path = tmp_path / f'bulk{n}{amount}.csv'
+        with path.open('w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Date', 'Description', 'Amount'])
+            for i in range(n):
+                merchant = 'STARBUCKS' if i % 2 else 'NETFLIX'
+                writer.writerow([f'08/{i % 28 + 1:02d}/2013', merchant, amount])
+        return path
+
+    def post(path):
+        with path.open('rb') as f:
+            return client.post('/api/import-csv', data={'file': (f, path.name)},
+                               content_type='multipart/form-data')
+
+    resp = post(write_csv(10))
+    data = resp.get_json()
+    assert data['imported'] == 10
+    assert 'rows_per_second' in data
+
+    # the number of statements does not grow with the row count
+    small = count_queries(client.application, lambda: post(write_csv(10, '-2.00')))
+    large = count_queries(client.application, lambda: post(write_csv(200, '-3.00')))
+    assert small == large
+
+    assert client.get('/api/dashboard-data/2013-08').get_json()['total_expenses'] == 630
+
+
+def test_import_csv_background_job(client, tmp_path):
+    import time
+    path = tmp_path / 'job.csv'
+    with path.open('w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Date', 'Description', 'Amount'])
+        for day in range(1, 6):
+            writer.writerow([f'09/{day:02d}/2014', 'Odd Little Shop', '-2.00'])
+
+    with path.open('rb') as f:
+        resp = client.post('/api/import-csv', data={'file': (f, 'job.csv'), 'background': '1'},
+                           content_type='multipart/form-data')
+    assert resp.status_code == 202
+    job_id = resp.get_json()['job_id']
+
+    deadline = time.time() + 10
+    while True:
+        job = client.get(f'/api/import-jobs/{job_id}').get_json()
+        if job['status'] in ('done', 'error') or time.time() > deadline:
+            break
+        time.sleep(0.05)
+    assert job['status'] == 'done', job
+    assert job['parsed'] == job['imported'] == 5
+    assert job['unknown_merchants'] == ['ODD LITTLE SHOP']
+    assert job['rows_per_second'] >= 0
+
+    assert client.get('/api/dashboard-data/2014-09').get_json()['total_expenses'] == 10
+    assert client.get('/api/import-jobs/nope').status_code == 404
+
+
+def test_import_csv_accepts_cp1252_upload(client):
+    import io
+    import time
+    body = 'Date,Description,Amount\r\n05/01/2020,Caf\u00e9 Z\u00f6rba \u201cLe Coin\u201d,-4.00\r\n'
+    data = body.encode('cp1252')
+    resp = client.post('/api/import-csv', data={'file': (io.BytesIO(data), 'latin.csv')},
+                       content_type='multipart/form-data')
+    assert resp.status_code == 200, resp.get_json()
+    assert resp.get_json()['imported'] == 1
+
+    resp = client.post('/api/import-csv', data={'file': (io.BytesIO(data.replace(b'05/01', b'05/02')),
+                                                         'latin.csv'), 'background': '1'},
+                       content_type='multipart/form-data')
+    assert resp.status_code == 202
+    job_url = resp.get_json()['status_url']
+    deadline = time.time() + 10
+    while client.get(job_url).get_json()['status'] not in ('done', 'error') and time.time() < deadline:
+        time.sleep(0.05)
+    assert client.get(job_url).get_json()['status'] == 'done'
+    with client.application.app_context():
+        from app import Transaction
+        from datetime import date
+        merchants = [tx.merchant for tx in Transaction.query.filter(
+            Transaction.date.between(date(2020, 5, 1), date(2020, 5, 2)))]
+    assert merchants == ['CAF\u00c9 Z\u00d6RBA \u201cLE COIN\u201d'] * 2
+
+
+def test_bulk_category_keywords_single_append(client, keyword_store, monkeypatch):
+    import categories
+    mappings = [{'keyword': f'bulkshop{i}', 'category': 'Hobbies'} for i in range(200)]
+    resp = client.post('/api/category-keywords/bulk', json={'mappings': mappings})
+    assert resp.status_code == 200
+    assert resp.get_json()['added'] == 200
+    assert categories.categorize_merchant('Paid BULKSHOP17 online') == 'Hobbies'
+    journal = (keyword_store / 'keywords.journal').read_text().splitlines()
+    assert len(journal) == 200
+    assert not (keyword_store / 'keywords.json').exists()
+
+    # Crossing the threshold folds the journal into the JSON file atomically
+    monkeypatch.setattr(categories, 'JOURNAL_COMPACT_THRESHOLD', 201)
+    resp = client.post('/api/category-keywords/bulk',
+                       json={'mappings': [{'keyword': 'bulkshop0', 'category': 'Crafts'}]})
+    assert resp.status_code == 200
+    assert not (keyword_store / 'keywords.journal').exists()
+    saved = json.loads((keyword_store / 'keywords.json').read_text())
+    assert saved['BULKSHOP0'] == 'Crafts' and saved['BULKSHOP199'] == 'Hobbies'
+
+    resp = client.post('/api/category-keywords/bulk', json={'mappings': [{'keyword': 'x'}]})
+    assert resp.status_code == 400
+
+
+def test_import_csv_day_first_dates_and_unmatched(client, tmp_path):
+    path = tmp_path / 'dayfirst.csv'
+    with path.open('w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Date', 'Description', 'Amount'])
+        writer.writerow(['25/10/2015', 'Day First Cafe', '-3.00'])
+        writer.writerow(['03/10/2015', 'Day First Cafe', '-4.00'])
+        writer.writerow(['soon', 'Day First Cafe', '-5.00'])
+
+    with path.open('rb') as f:
+        resp = client.post('/api/import-csv', data={'file': (f, 'dayfirst.csv')},
+                           content_type='multipart/form-data')
+    data = resp.get_json()
+    assert resp.status_code == 200
+    assert data['imported'] == 2
+    assert data['date_format'] == '%d/%m/%Y'
+    assert data['unmatched_dates'] == 1
+    assert data['unmatched_date_rows'] == [{'row': 3, 'date': 'soon'}]
+    assert client.get('/api/dashboard-data/2015-10').get_json()['total_expenses'] == 7
+
+
+def test_import_layout_registry(client, tmp_path, monkeypatch):
+    import csv_importer
+    path = tmp_path / 'layout.csv'
+    with path.open('w', newline='') as f:
+        f.write('Statement for account 42\n\n')
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(['Booked', 'Payee', 'Memo', 'Amount'])
+        writer.writerow(['11/02/2016', 'Layout Shop', 'Layout Memo', '-6.00'])
+
+    def post():
+        with path.open('rb') as f:
+            return client.post('/api/import-csv', data={'file': (f, 'layout.csv')},
+                               content_type='multipart/form-data')
+
+    assert post().status_code == 200
+    layouts = client.get('/api/import-layouts').get_json()
+    layout = next(l for l in layouts if l['header'] == ['Booked', 'Payee', 'Memo', 'Amount'])
+    assert layout['preamble'] == 2
+    assert layout['dialect']['delimiter'] == ';'
+    assert layout['columns']['description'] == 'Payee'
+    assert layout['columns']['amount'] == 'Amount'
+    assert layout['columns']['date'] is None
+
+    # The date column was not recognised; fix it by hand
+    fingerprint = layout['fingerprint']
+    resp = client.put(f'/api/import-layouts/{fingerprint}',
+                      json={'columns': {'date': 'Booked', 'description': 'Memo'}})
+    assert resp.status_code == 200 and resp.get_json()['source'] == 'manual'
+    assert client.put(f'/api/import-layouts/{fingerprint}',
+                      json={'columns': {'date': 'Nope'}}).status_code == 400
+
+    # Repeat imports reuse the saved layout without sniffing
+    monkeypatch.setattr(csv_importer, '_detect_layout', None)
+    data = post().get_json()
+    assert data['imported'] == 1 and data['date_format'] == '%m/%d/%Y'
+    with client.application.app_context():
+        from app import Transaction
+        assert Transaction.query.filter_by(merchant='LAYOUT MEMO').count() == 1
+
+    assert client.delete(f'/api/import-layouts/{fingerprint}').status_code == 200
+    assert client.delete(f'/api/import-layouts/{fingerprint}').status_code == 404
+
+
+def test_import_csv_skips_duplicates(client, tmp_path):
+    def post(name, rows):
+        path = tmp_path / name
+        with path.open('w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Date', 'Description', 'Amount'])
+            writer.writerows(rows)
+        with path.open('rb') as f:
+            return client.post('/api/import-csv', data={'file': (f, name)},
+                               content_type='multipart/form-data').get_json()
+
+    first = [
+        ['12/01/2017', 'Dup Coffee', '-3.00'],
+        ['12/01/2017', 'Dup Coffee', '-3.00'],  # a genuine second coffee
+        ['12/02/2017', 'Dup Books', '-20.00'],
+    ]
+    data = post('first.csv', first)
+    assert data['imported'] == 3 and data['duplicates'] == 0
+
+    # Overlapping statement: the same three rows, one punctuated differently,
+    # plus a third coffee and a new day
+    overlap = [
+        ['12/01/2017', 'Dup Coffee.', '-3.00'],
+        ['12/01/2017', 'Dup Coffee', '-3.00'],
+        ['12/01/2017', 'Dup Coffee', '-3.00'],
+        ['12/02/2017', 'Dup Books', '-20.00'],
+        ['12/03/2017', 'Dup Books', '-20.00'],
+    ]
+    data = post('overlap.csv', overlap)
+    assert data['duplicates'] == 3 and data['imported'] == 2
+    assert 'duplicates skipped' in data['message']
+    assert client.get('/api/dashboard-data/2017-12').get_json()['total_expenses'] == 49
+
+
+def test_import_uses_merchant_history(client, tmp_path):
+    from app import merchant_history
+    cats = {c['name']: c['id'] for c in client.get('/api/categories').get_json()}
+    ids = []
+    for day in (1, 2):
+        resp = client.post('/api/transactions', json={
+            'amount': '9', 'transaction_type': 'expense', 'category_id': cats['Groceries'],
+            'date': f'2018-01-0{day}', 'merchant': 'Hist Corner Store',
+        })
+        ids.append(resp.get_json()['id'])
+
+    path = tmp_path / 'history.csv'
+    with path.open('w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Date', 'Description', 'Amount'])
+        writer.writerow(['01/10/2018', 'HIST CORNER STORE', '-4.00'])
+        writer.writerow(['01/11/2018', 'Hist Unheard Of', '-1.00'])
+    with path.open('rb') as f:
+        data = client.post('/api/import-csv', data={'file': (f, 'history.csv')},
+                           content_type='multipart/form-data').get_json()
+    assert data['history'] == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+    assert data['unknown_merchants'] == ['HIST UNHEARD OF']
+    with client.application.app_context():
+        from app import Transaction
+        tx = Transaction.query.filter_by(merchant='HIST CORNER STORE').one()
+        assert tx.category.name == 'Groceries'
+
+    # User corrections move the majority
+    for tx_id in ids:
+        client.put(f'/api/transactions/{tx_id}', json={'category_id': cats['Gas']})
+    assert merchant_history.lookup('hist corner store') == 'Gas'
+    for tx_id in ids:
+        client.delete(f'/api/transactions/{tx_id}')
+    assert merchant_history.lookup('Hist Corner Store') == 'Groceries'
+
+
+def test_import_fuzzy_fallback_and_unknown_clusters(client, tmp_path):
+    cats = {c['name']: c['id'] for c in client.get('/api/categories').get_json()}
+    client.post('/api/transactions', json={
+        'amount': '7', 'transaction_type': 'expense', 'category_id': cats['Groceries'],
+        'date': '2019-02-01', 'merchant': 'Fuzzwick Bakery',
+    })
+
+    def post(month, fuzzy):
+        path = tmp_path / f'fuzzy-{month}.csv'
+        with path.open('w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Date', 'Description', 'Amount'])
+            writer.writerow([f'{month}/10/2019', 'FUZZWICK BAKERIES', '-4.00'])
+            writer.writerow([f'{month}/11/2019', 'Zorblat Traders', '-1.00'])
+            writer.writerow([f'{month}/12/2019', 'Zorblat Trader', '-2.00'])
+            writer.writerow([f'{month}/13/2019', 'Quillion Widgets', '-3.00'])
+        with path.open('rb') as f:
+            return client.post('/api/import-csv', data={'file': (f, path.name), 'fuzzy': fuzzy},
+                               content_type='multipart/form-data').get_json()
+
+    data = post('03', '0')
+    assert data['fuzzy'] == {'enabled': False, 'matches': 0}
+    assert 'FUZZWICK BAKERIES' in data['unknown_merchants']
+    clusters = {tuple(c['merchants']): c['suggestion'] for c in data['unknown_clusters']}
+    assert ('ZORBLAT TRADER', 'ZORBLAT TRADERS') in clusters
+    suggestion = clusters[('FUZZWICK BAKERIES',)]
+    assert suggestion['match'] == 'FUZZWICK BAKERY' and suggestion['category'] == 'Groceries'
+
+    data = post('04', '1')
+    assert data['fuzzy'] == {'enabled': True, 'matches': 1}
+    assert 'FUZZWICK BAKERIES' not in data['unknown_merchants']
+    with client.application.app_context():
+        from app import Transaction
+        from datetime import date
+        tx = Transaction.query.filter_by(merchant='FUZZWICK BAKERIES', date=date(2019, 4, 10)).one()
+        assert tx.category.name == 'Groceries'
@@ -1,5 +1,7 @@
 import csv
-from csv_importer import import_csv
+import io
+import os
+from csv_importer import import_csv, iter_import_csv
 from categories import categorize_merchant
 
 
@@ -90,3 +92,215 @@ def test_fidelity_like_format(tmp_path):
     merchants = {r['merchant'] for r in parsed}
     assert 'DEBIT CARD PURCHASE PAYPAL *RESUME IO' in merchants
     assert 'DIRECT DEPOSIT AMAZON RETAIDIRECT DEP' in merchants
+
+
+def test_iter_import_csv_batches(tmp_path):
+    data = [['Date', 'Description', 'Amount']]
+    data += [[f'07/{d:02d}/2025', 'Random Shop', '-1.00'] for d in range(1, 6)]
+    file = tmp_path / 'tx.csv'
+    with file.open('w', newline='') as f:
+        csv.writer(f).writerows(data)
+
+    unknown = set()
+    batches = iter_import_csv(str(file), unknown, batch_size=2)
+    first = next(batches)
+    assert [r['date'] for r in first] == ['07/01/2025', '07/02/2025']
+    assert unknown == {'RANDOM SHOP'}
+    rest = list(batches)
+    assert [len(b) for b in rest] == [2, 1]
+
+    rows, _ = import_csv(str(file))
+    assert rows == first + [r for b in rest for r in b]
+
+
+class _ForwardOnly:
+    """Text stream that cannot seek or tell, like a socket."""
+
+    def __init__(self, text):
+        self._lines = iter(text.splitlines(keepends=True))
+
+    def __iter__(self):
+        return self._lines
+
+
+def test_import_csv_from_non_seekable_stream():
+    text = (
+        'Account export\n'
+        '\n'
+        'Post Date;Description;Amount\n'
+        '07/01/2025;Starbucks Coffee;-4.50\n'
+        '07/02/2025;Random Shop;-2.00\n'
+    )
+    rows, unknown = import_csv(_ForwardOnly(text))
+    assert [r['date'] for r in rows] == ['07/01/2025', '07/02/2025']
+    assert rows[0]['category_guess'] == 'Coffee'
+    assert unknown == {'RANDOM SHOP'}
+
+
+def test_import_csv_from_stream_without_header():
+    rows, _ = import_csv(io.StringIO('POS WALMART 123 GA,-10.00\nPOS SHELL 456 TX,-20.50\n'))
+    assert [r['amount'] for r in rows] == [-10.0, -20.5]
+
+
+def test_parallel_import_matches_serial(tmp_path, monkeypatch):
+    import csv_importer
+    merchants = ['POS WALMART 123 GA', 'Starbucks Coffee', 'Random Shop', 'POS SHELL 456 TX']
+    data = [['Date', 'Description', 'Amount']]
+    data += [[f'07/{i % 28 + 1:02d}/2025', f'{merchants[i % 4]} #{i}', f'-{i}.25'] for i in range(50)]
+    file = tmp_path / 'tx.csv'
+    with file.open('w', newline='') as f:
+        csv.writer(f).writerows(data)
+
+    monkeypatch.setattr(csv_importer, 'PARALLEL_CHUNK_SIZE', 7)
+    serial = import_csv(str(file))
+    parallel = import_csv(str(file), workers=2)
+    assert parallel == serial
+    assert [r['amount'] for r in parallel[0]] == [-(i + 0.25) for i in range(50)]
+
+
+def test_keyword_automaton_keeps_first_match_priority():
+    from categories import KeywordAutomaton
+    keywords = ['UBER EATS', 'UBER', 'EATS', 'BER E']
+    automaton = KeywordAutomaton(keywords)
+    for text in ['UBER EATS SF', 'UBER TRIP', 'JUST EATS', 'XBER EATS', 'NOTHING', '']:
+        expected = next((i for i, k in enumerate(keywords) if k in text), None)
+        assert automaton.first_match(text) == expected
+
+
+def test_add_keyword_category_refreshes_matcher(tmp_path, monkeypatch):
+    import categories
+    monkeypatch.setattr(categories, 'CATEGORY_KEYWORDS', {'SHELL': 'Gas'})
+    monkeypatch.setattr(categories, '_JOURNAL_PATH', str(tmp_path / 'keywords.journal'))
+    categories.invalidate_keywords()
+    try:
+        assert categorize_merchant('Zyx Widgets') is None
+        categories.add_keyword_category('zyx', 'Hobbies')
+        assert categorize_merchant('Zyx Widgets') == 'Hobbies'
+        before = categories._keyword_automaton()
+        categories.add_keyword_category('ZYX', 'Crafts')
+        assert categorize_merchant('Zyx Widgets') == 'Crafts'
+        # category-only changes reuse the automaton but never mutate a
+        # category list a concurrent lookup may be reading
+        after = categories._keyword_automaton()
+        assert after[0] is before[0] and before[1] == ['Gas', 'Hobbies']
+        assert categorize_merchant('Shell Zyx') == 'Gas'
+    finally:
+        monkeypatch.undo()
+        categories.invalidate_keywords()
+
+
+def test_import_reports_cache_hits(tmp_path):
+    data = [['Date', 'Description', 'Amount']]
+    data += [[f'07/0{d}/2025', 'Qqz Cache Probe Shop', '-1.00'] for d in range(1, 7)]
+    file = tmp_path / 'tx.csv'
+    with file.open('w', newline='') as f:
+        csv.writer(f).writerows(data)
+
+    stats = {}
+    rows = list(iter_import_csv(str(file), cache_stats=stats))
+    assert len(rows) == 6
+    assert stats == {
+        'description_hits': 5,
+        'description_misses': 1,
+        'category_hits': 5,
+        'category_misses': 1,
+    }
+
+
+def test_keyword_journal_replay_skips_torn_line(tmp_path, monkeypatch):
+    import categories
+    journal = tmp_path / 'keywords.journal'
+    journal.write_text('{"keyword": "AAA", "category": "One"}\n'
+                       '{"keyword": "AAA", "category": "Two"}\n'
+                       '{"keyword": "BB')
+    monkeypatch.setattr(categories, '_JOURNAL_PATH', str(journal))
+    keywords = {'AAA': 'Zero'}
+    assert categories._replay_journal(keywords) == 2
+    assert keywords == {'AAA': 'Two'}
+
+
+def test_infer_date_format():
+    from csv_importer import infer_date_format
+    assert infer_date_format(['07/01/2025', '12/31/2025']) == '%m/%d/%Y'
+    assert infer_date_format(['2025-07-01', '2025-12-31']) == '%Y-%m-%d'
+    # Ambiguous until a day above 12 shows up
+    assert infer_date_format(['01/07/2025', '31/07/2025']) == '%d/%m/%Y'
+    assert infer_date_format(['07/01', '']) == '%m/%d'
+    assert infer_date_format(['', 'not a date']) is None
+
+
+def test_date_column_parser_reports_unmatched():
+    from datetime import date
+    from csv_importer import DateColumnParser
+    dates = DateColumnParser()
+    values = ['13/07/2025', '14/07/2025', 'garbage', None, '13/07/2025']
+    dates.prime(v for v in values if v)
+    assert dates.format == '%d/%m/%Y'
+    parsed = [dates.parse(v) for v in values]
+    assert parsed == [date(2025, 7, 13), date(2025, 7, 14), None, None, date(2025, 7, 13)]
+    assert dates.unmatched == [(3, 'garbage'), (4, '')]
+
+
+def test_merchant_category_index_majority():
+    from merchant_index import MerchantCategoryIndex
+    index = MerchantCategoryIndex(ignored=('Uncategorized',))
+    index.load([('Corner Store #1', 'Groceries', 3), ('CORNER STORE 1', 'Dining', 1),
+                ('Mystery', 'Uncategorized', 5)])
+    assert index.lookup('corner-store 1') == 'Groceries'
+    assert index.lookup('Mystery') is None
+    index.add('Corner Store 1', 'Dining', 3)
+    assert index.lookup('Corner Store 1') == 'Dining'
+    index.remove('Corner Store 1', 'Dining', 4)
+    index.remove('Corner Store 1', 'Groceries', 3)
+    assert index.lookup('Corner Store 1') is None and len(index) == 0
+
+
+def test_history_takes_precedence_over_keywords():
+    text = 'Description,Amount\nShell Corner Shop,-3\nShell Station,-4\n'
+    rows = list(iter_import_csv(io.StringIO(text), history={'SHELL CORNER SHOP': 'Groceries'}))
+    assert [(r['category_guess'], r['category_source']) for r in rows] == [
+        ('Groceries', 'history'), ('Gas', 'keyword'),
+    ]
+
+
+def test_trigram_index_and_clusters():
+    from merchant_index import TrigramIndex, cluster_merchants
+    index = TrigramIndex(threshold=0.5)
+    index.add('Starbucks', 'Coffee')
+    index.add('Walgreens', 'Pharmacy')
+    term, category, score = index.match('STARBUCK #12')
+    assert (term, category) == ('STARBUCKS', 'Coffee') and 0.5 <= score < 1
+    assert index.match('Unrelated Words') is None
+    assert cluster_merchants(['AMZN MKTP US', 'AMAZON MKTPLACE', 'AMZN MKTP', 'ZORBLAT'], 0.4) == [
+        ['AMAZON MKTPLACE', 'AMZN MKTP', 'AMZN MKTP US'], ['ZORBLAT'],
+    ]
+
+
+def test_fuzzy_fallback_after_history_and_keywords():
+    from merchant_index import TrigramIndex
+    fuzzy = TrigramIndex(threshold=0.5)
+    fuzzy.add('FUZZWICK BAKERY', 'Groceries')
+    text = 'Description,Amount\nFuzzwick Bakery Co,-3\nShell Station,-4\nZorblat Traders,-5\n'
+    unknown = set()
+    rows = list(iter_import_csv(io.StringIO(text), unknown, fuzzy=fuzzy))
+    assert [(r['category_guess'], r['category_source']) for r in rows] == [
+        ('Groceries', 'fuzzy'), ('Gas', 'keyword'), ('Uncategorized', None),
+    ]
+    assert unknown == {'ZORBLAT TRADERS'}
+
+
+def test_layout_registry_default_path_ignores_cwd(tmp_path, monkeypatch):
+    import import_layouts
+    monkeypatch.chdir(tmp_path)
+    registry = import_layouts.LayoutRegistry()
+    assert registry.path == os.path.join(os.path.dirname(import_layouts.__file__), 'import_layouts.json')
+
+
+def test_open_csv_stream_reads_spooled_upload():
+    import tempfile
+    from csv_importer import open_csv_stream
+    spool = tempfile.SpooledTemporaryFile()
+    spool.write('Description,Amount\r\nCafé Shell,-3\r\n'.encode('cp1252'))
+    spool.seek(0)
+    rows = list(iter_import_csv(open_csv_stream(spool)))
+    assert [(r['merchant'], r['amount']) for r in rows] == [('CAFÉ SHELL', -3.0)]
@@ -0,0 +1,105 @@
+import os
+import sqlite3
+from datetime import date
+
+import pytest
+
+
+@pytest.fixture
+def app_ctx(tmp_path):
+    os.environ['BUDGET_DB_URI'] = 'sqlite:///' + str(tmp_path / 'test.db')
+    from app import app, db, init_database
+    with app.app_context():
+        db.create_all()
+        init_database()
+        yield app
+        db.session.remove()
+
+
+def query_plan(query):
+    """Return the EXPLAIN QUERY PLAN details for an ORM query."""
+    from app import db
+    compiled = query.statement.compile(db.engine, compile_kwargs={'render_postcompile': True})
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = db.session.connection().exec_driver_sql(
+        'EXPLAIN QUERY PLAN ' + str(compiled), params
+    ).fetchall()
+    return ' | '.join(row[-1] for row in rows)
+
+
+def test_migrations_upgrade_legacy_database(tmp_path):
+    from app import SCHEMA_MIGRATIONS, apply_schema_migrations
+
+    conn = sqlite3.connect(str(tmp_path / 'legacy.db'))
+    conn.executescript(
+        'CREATE TABLE budget (id INTEGER PRIMARY KEY, month VARCHAR(7), category_id INTEGER, amount FLOAT);'
+        'CREATE TABLE "transaction" (id INTEGER PRIMARY KEY, amount FLOAT, transaction_type VARCHAR(50),'
+        ' category_id INTEGER, description VARCHAR(200), merchant VARCHAR(100), date DATE, notes VARCHAR(300));'
+        "INSERT INTO budget (month, category_id, amount) VALUES ('2023-01', 1, 5), ('2023-01', 1, 6);"
+        'INSERT INTO "transaction" (amount, transaction_type, category_id, description, merchant, date) VALUES'
+        " (3, 'expense', 1, 'CAFE', 'CAFE', '2023-01-02'), (3, 'expense', 1, 'CAFE', 'CAFE', '2023-01-02'),"
+        " (3, 'expense', 1, 'Lunch', 'CAFE', '2023-01-02'),"
+        " (3, 'fund_contribution', 1, 'CAFE', 'CAFE', '2023-01-02');"
+    )
+    latest = SCHEMA_MIGRATIONS[-1][0]
+    assert apply_schema_migrations(conn) == latest
+    # running again is a no-op
+    assert apply_schema_migrations(conn) == latest
+
+    versions = [v for (v,) in conn.execute('SELECT version FROM schema_version ORDER BY version')]
+    assert versions == [v for v, _, _ in SCHEMA_MIGRATIONS]
+    indexes = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+    assert {'ix_budget_month_category', 'ix_transaction_date_type_category_amount',
+            'ix_transaction_category_type', 'ix_transaction_import_fingerprint'} <= indexes
+    assert conn.execute('SELECT amount FROM budget').fetchall() == [(5,)]
+    # identical imported rows get distinct fingerprints via the occurrence
+    # counter; manual entries and fund movements are left alone
+    fingerprints = [fp for (fp,) in conn.execute('SELECT import_fingerprint FROM "transaction" ORDER BY id')]
+    assert len(set(fingerprints[:2])) == 2 and None not in fingerprints[:2]
+    assert fingerprints[2:] == [None, None]
+    conn.close()
+
+
+def test_hot_transaction_queries_use_indexes(app_ctx):
+    from sqlalchemy import func
+    from app import Transaction, db
+
+    date_range = db.session.query(func.sum(Transaction.amount)).filter(
+        Transaction.date >= date(2023, 1, 1),
+        Transaction.date < date(2023, 2, 1),
+        Transaction.transaction_type == 'expense'
+    )
+    plan = query_plan(date_range)
+    assert 'USING COVERING INDEX ix_transaction_date_type_category_amount' in plan
+
+    by_category = db.session.query(func.sum(Transaction.amount)).filter(
+        Transaction.category_id == 1,
+        Transaction.transaction_type.in_(['fund_contribution', 'expense'])
+    )
+    plan = query_plan(by_category)
+    assert 'ix_transaction_category_type' in plan
+    assert 'SCAN' not in plan.replace('SCAN CONSTANT', '')
+
+
+def test_deferred_migration_is_retried(tmp_path, monkeypatch):
+    import app as app_module
+    from app import SCHEMA_MIGRATIONS, MigrationDeferred, apply_schema_migrations
+
+    ready = []
+
+    def step(cursor):
+        if not ready:
+            raise MigrationDeferred('not yet')
+        cursor.execute('CREATE TABLE later (id INTEGER PRIMARY KEY)')
+
+    monkeypatch.setattr(app_module, 'SCHEMA_MIGRATIONS', [(1, 'Deferred step', step)] + SCHEMA_MIGRATIONS[1:])
+    conn = sqlite3.connect(str(tmp_path / 'deferred.db'))
+    latest = SCHEMA_MIGRATIONS[-1][0]
+    assert apply_schema_migrations(conn) == latest
+    assert 1 not in {v for (v,) in conn.execute('SELECT version FROM schema_version')}
+
+    # a later startup picks up the step even though newer versions are recorded
+    ready.append(True)
+    assert apply_schema_migrations(conn) == latest
+    assert 1 in {v for (v,) in conn.execute('SELECT version FROM schema_version')}
+    conn.close()
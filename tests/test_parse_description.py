@@ -0,0 +1,123 @@
+"""Differential test for the precompiled ``parse_description``.
+
+The original regex chain is kept here verbatim and both implementations are
+run over a generated corpus of bank-statement style descriptions.
+"""
+
+import random
+import re
+
+from csv_importer import parse_description
+
+LEGACY_STATES_RE = re.compile(
+    r'(AL|AK|AZ|AR|CA|CO|CT|DE|FL|GA|HI|ID|IL|IN|IA|KS|KY|LA|ME|MD|MA|MI|MN|MS|MO|MT|NE|NV|NH|'
+    r'NJ|NM|NY|NC|ND|OH|OK|OR|PA|RI|SC|SD|TN|TX|UT|VT|VA|WA|WV|WI|WY)$'
+)
+
+LEGACY_THIRD_PARTIES_RE = re.compile(r'^(...?\*|LEVELUP\*|PAYPAL \*)')
+
+
+def legacy_parse_description(raw):
+    """parse_description as it was before the single-pass rewrite."""
+    desc = raw
+    time = None
+    date = None
+    phone = None
+    country = None
+    state = None
+
+    m = re.search(r'([0-9]{2}:[0-9]{2}:[0-9]{2})', desc)
+    if m:
+        time = m.group(1)
+        desc = re.sub(r'([0-9]{2}:[0-9]{2}:[0-9]{2})', '', desc, count=1)
+
+    m = re.search(r'([0-1][0-9]/[0-3][0-9])', desc)
+    if m:
+        date = m.group(1)
+        desc = re.sub(r'([0-1][0-9]/[0-3][0-9])', '', desc, count=1)
+
+    desc = re.sub('Branch Cash Withdrawal', '', desc, flags=re.IGNORECASE)
+
+    m = re.search(r'([0-9]{3}-[0-9]{3}-[0-9]{4})', desc)
+    if m:
+        phone = m.group(1)
+        desc = re.sub(r'([0-9]{3}-[0-9]{3}-[0-9]{4})', '', desc, count=1)
+
+    desc = desc.strip()
+    desc = re.sub(r'^POS ', '', desc)
+
+    m = re.search(r'(US)$', desc)
+    if m:
+        country = m.group(1)
+        desc = re.sub(r'(US)$', '', desc).strip()
+
+    m = LEGACY_STATES_RE.search(desc)
+    if m:
+        state = m.group(1)
+        desc = LEGACY_STATES_RE.sub('', desc).strip()
+
+    merchant = desc.upper()
+    merchant = LEGACY_THIRD_PARTIES_RE.sub('', merchant)
+    merchant = re.sub(r'\s\s+.+$', '', merchant)
+    merchant = merchant.strip()
+    merchant = re.sub(r'X+-?X+', '', merchant)
+    merchant = re.sub(r'( ID:.*| PAYMENT ID:.*| PMT ID:.*)', '', merchant)
+    merchant = merchant.strip()
+    merchant = re.sub(r'[#]?[ ]?([0-9]){1,999}$', '', merchant)
+    merchant = merchant.strip()
+    merchant = re.sub(r'([ ]?-[ ]?|[_])', '', merchant)
+    merchant = merchant.strip()
+    merchant = re.sub(r'[.]com.*$', '', merchant)
+    merchant = merchant.strip()
+    merchant = re.sub(r' .$', '', merchant)
+    merchant = merchant.strip()
+    if merchant == '':
+        merchant = ' '
+
+    return {
+        'description': desc.strip(),
+        'time': time,
+        'date': date,
+        'phone': phone,
+        'country': country,
+        'state': state,
+        'merchant': merchant,
+    }
+
+
+PREFIXES = [
+    '', 'POS ', 'POS  ', 'Branch Cash Withdrawal ', 'BRANCH CASH WITHDRAWAL ', 'DEBIT CARD PURCHASE ',
+    'ACH WITHDRAWAL ', 'Card Purchase ', 'RECURRING PAYMENT ', 'SQ *', 'TST* ', 'PAYPAL *', 'LEVELUP*', 'PP*',
+]
+MERCHANTS = [
+    'WALMART', 'Starbucks Coffee', 'NETFLIX.COM', 'Amazon.com*2K4 AMZN.COM/BILL', 'SHELL OIL', 'Trader Joe s',
+    'CHICK-FIL-A', 'UBER   EATS', 'Uber Trip', 'AT&T', '7-ELEVEN', 'HOME_DEPOT', 'Local Hardware', 'XXXXX1234',
+    'XX-XX', 'GITHUB PAYMENT ID: 123', 'Venmo PMT ID:88', 'ACME ID:42', 'Dunkin #0042', 'CVS/PHARMACY # 1234',
+    'A', 'US', 'GA', 'Bus', 'PLUS', '', '   ', 'caf\u00e9 du monde', 'Tab\tSeparated', 'ROSS - STORES',
+]
+EXTRAS = [
+    '', ' 12:34:56', ' 07/01', ' 13/45', ' 866-579-7172', ' #123', ' 0042', ' US', ' GA', ' TX US', ' CA',
+    ' 07/02 08:00:00', '  TRAILER', ' .', ' X', ' -', ' _', ' ID:', ' 99:99:99 01/31',
+]
+
+
+def corpus(n=20000, seed=1234):
+    rng = random.Random(seed)
+    for _ in range(n):
+        parts = [rng.choice(PREFIXES), rng.choice(MERCHANTS)]
+        parts += [rng.choice(EXTRAS) for _ in range(rng.randint(0, 4))]
+        tail = parts[1:]
+        rng.shuffle(tail)
+        parts[1:] = tail
+        text = ''.join(parts)
+        if rng.random() < 0.1:
+            text = ' ' + text + rng.choice(['', ' ', '  ', '\t'])
+        yield text
+    alphabet = 'AUSX0123456789 -_#*./:IDPOcom\t'
+    for _ in range(n):
+        yield ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 24)))
+
+
+def test_parse_description_matches_legacy():
+    for raw in corpus():
+        assert parse_description(raw) == legacy_parse_description(raw), raw